@@ -1,5 +1,3 @@
-import time
-
 import telnetlib3
 import asyncio
 
@@ -42,7 +40,7 @@ async def configure_csr_device(address: str, port: int, user: str, password: str
         t_writer.write('2\n')
 
         for _ in range(10):
-            time.sleep(60)
+            await asyncio.sleep(60)
             t_writer.write('\n')
             try:
                 await asyncio.wait_for(t_reader.readuntil(hostname), timeout=10)
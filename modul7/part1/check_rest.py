@@ -18,8 +18,7 @@ class Example(aetest.Testcase):
         out = conn_class.get_interface('GigabitEthernet1')
         conn_class.get_restconf_capabilities()
         conn_class.get_restconf_capabilities()
-        for api in conn_class.api_endpoints.copy():
-            conn_class.get_api_endpoint(api)
+        conn_class.fetch_schemas()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,272 @@
+"""
+async_ssh_connector is the asyncio version of ssh_connector_paramiko: many SSH
+sessions share one event loop instead of one blocking channel per thread.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import asyncssh
+from pyats.datastructures import AttrDict
+from pyats.topology import Device
+
+from config_renderer import ConfigCommands, ConfigRenderer, device_prompt
+from prompt_registry import prompt_matcher
+from ssh_connector_paramiko import SSHConnectorParamiko
+
+logger = logging.getLogger(__name__)
+
+# Disable propagation to prevent pyATS from double-logging
+logger.propagate = False
+
+# Configure only if no handlers exist (prevent duplicates)
+if not logger.handlers:
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('> %(message)s'))  # Simple arrow prefix
+    logger.addHandler(handler)
+
+
+class AsyncSSHConnector:
+    """
+    SSH connector with the same operations as SSHConnectorParamiko, where every call that
+    touches the network is a coroutine.
+    """
+    DEFAULT_PROMPT: str = SSHConnectorParamiko.DEFAULT_PROMPT
+    SCAN_WINDOW: int = SSHConnectorParamiko.SCAN_WINDOW
+
+    def __init__(self, device: Device, **kwargs) -> None:
+        """
+        Initialize the SSH connector with a pyATS Device.
+
+        Args:
+            device (Device): pyATS device object to connect to.
+            **kwargs: Optional parameters like timeout, buffer_size, batch, chunk_size and renderer
+                (same meaning as for SSHConnectorParamiko).
+        """
+        self.device: Device = device
+        self.conn: Optional[asyncssh.SSHClientConnection] = None
+        self.shell: Optional[asyncssh.SSHClientProcess] = None
+        self._connected: bool = False
+        self.timeout: float = kwargs.get('timeout', 10)
+        self._buffer_size: int = kwargs.get('buffer_size', 4096)
+        self.batch: bool = kwargs.get('batch', False)
+        self.chunk_size: int = kwargs.get('chunk_size', 64)
+        self.renderer: ConfigRenderer = kwargs.get('renderer') or ConfigRenderer()
+
+    async def connect(self, **kwargs) -> None:
+        """
+        Establish an SSH connection and open an interactive shell.
+
+        Raises:
+            ValueError: If connection info is missing.
+            RuntimeError: If connection or shell invocation fails.
+        """
+        connection: Optional[AttrDict] = kwargs.get('connection') or self.device.connections.ssh
+        if not connection:
+            raise ValueError("Missing connection information.")
+
+        ip: str = connection.ip.compressed
+        port: int = connection.port or 22
+        try:
+            self.conn = await asyncio.wait_for(asyncssh.connect(
+                ip,
+                port=port,
+                username=self.device.credentials.default.username,
+                password=self.device.credentials.default.password.plaintext,
+                known_hosts=None,
+                client_keys=None,
+                agent_path=None,
+            ), timeout=self.timeout)
+            self.shell = await self.conn.create_process(term_type='vt100', encoding=None)
+            self._connected = True
+            await self._clear_buffer()
+        except Exception as e:
+            raise RuntimeError(f"Failed to connect to {ip}:{port} - {e}")
+
+    async def _clear_buffer(self) -> None:
+        """Flush the banner and the first prompt from the shell."""
+        try:
+            await self._read_until_prompt(self.DEFAULT_PROMPT, timeout=2)
+        except TimeoutError:
+            pass
+
+    def is_connected(self) -> bool:
+        """
+        Check if the SSH connection is active.
+        """
+        return self._connected and self.conn is not None and not self.shell.is_closing()
+
+    async def disconnect(self) -> None:
+        """Save the configuration and close the SSH shell and client connections."""
+        try:
+            if self._connected:
+                await self.execute('write', prompt=[r'\[OK\]', r'#'])
+        finally:
+            if self.shell:
+                self.shell.close()
+            if self.conn:
+                self.conn.close()
+                await self.conn.wait_closed()
+            self._connected = False
+
+    async def _read_until_prompt(self, prompt_patterns: Union[str, List[str]], timeout: Optional[float] = None,
+                                 count: int = 1) -> str:
+        """
+        Read from shell until a prompt pattern is matched (count times) or timeout occurs.
+
+        Raises:
+            TimeoutError: If prompt is not detected within timeout.
+            RuntimeError: If the shell is closed by the device.
+        """
+        matcher = prompt_matcher(prompt_patterns)
+        buffer = bytearray()
+        matched = 0
+        matched_end = 0
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + (timeout or self.timeout)
+
+        while True:
+            remaining = end_time - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(self.shell.stdout.read(self._buffer_size), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                raise RuntimeError("Channel closed by remote device.")
+
+            scan_from = max(matched_end, len(buffer) - self.SCAN_WINDOW)
+            buffer += chunk
+            while True:
+                match = matcher.search(buffer, scan_from)
+                if match is None:
+                    break
+                matched += 1
+                if matched >= count:
+                    return buffer.decode(errors='ignore')
+                matched_end = scan_from = match.end()
+
+        raise TimeoutError(f"Timeout waiting for prompt(s) {list(matcher.patterns)}. Output so far:\n{buffer.decode(errors='ignore')}")
+
+    async def execute(self, command: str, prompt: Optional[Union[str, List[str]]] = None,
+                      timeout: Optional[float] = None) -> str:
+        """
+        Execute a command on the remote device and wait for prompt.
+
+        Raises:
+            RuntimeError: If connection not established or on command errors.
+        """
+        if not self._connected or not self.shell:
+            raise RuntimeError("SSH connection is not established. Call connect() first.")
+
+        logger.info(command)
+        try:
+            self.shell.stdin.write(f"{command}\n".encode())
+            return await self._read_until_prompt(prompt or self.DEFAULT_PROMPT, timeout)
+        except TimeoutError as e:
+            raise RuntimeError(f"Timeout executing command '{command}': {e}")
+        except Exception as e:
+            raise RuntimeError(f"Error executing command '{command}': {e}")
+
+    async def send_config_batch(self, commands: ConfigCommands, timeout: Optional[float] = None) -> str:
+        """
+        Stream a whole block of configuration lines, chunk by chunk, and check the echoed
+        output for rejected lines (see SSHConnectorParamiko.send_config_batch).
+        """
+        if not self._connected or not self.shell:
+            raise RuntimeError("SSH connection is not established. Call connect() first.")
+
+        lines = [command for command, _ in commands]
+        chunk_size = self.chunk_size if self.chunk_size > 0 else len(lines) or 1
+        output = []
+        for start in range(0, len(lines), chunk_size):
+            chunk = lines[start:start + chunk_size]
+            for line in chunk:
+                logger.info(line)
+            try:
+                self.shell.stdin.write(''.join(f"{line}\n" for line in chunk).encode())
+                output.append(await self._read_until_prompt(device_prompt(self.device), timeout, count=len(chunk)))
+            except TimeoutError as e:
+                raise RuntimeError(f"Timeout pushing configuration batch: {e}")
+
+        output = ''.join(output)
+        errors = SSHConnectorParamiko.find_config_errors(output)
+        if errors:
+            details = '\n'.join(f" - '{command}': {message}" for command, message in errors)
+            raise RuntimeError(f"Configuration rejected on {self.device.name}:\n{details}")
+        return output
+
+    async def push_config(self, commands: ConfigCommands) -> None:
+        """Send rendered configuration lines, either as one batch or one execute() per line."""
+        if not commands:
+            return
+        if self.batch:
+            await self.send_config_batch(commands)
+        else:
+            for command, prompt in commands:
+                await self.execute(command, prompt=prompt)
+
+    async def configure_interfaces(self) -> None:
+        """Configure interface addresses and ip helpers (see config_renderer.interface_commands)."""
+        await self.push_config(self.renderer.render(self.device, 'interfaces'))
+
+    async def configure_routing(self) -> None:
+        """Configure static routes, or OSPF when none are defined (see config_renderer.routing_commands)."""
+        await self.push_config(self.renderer.render(self.device, 'routing'))
+
+    async def configure_dhcp(self) -> None:
+        """Configure the DHCP pools from custom.dhcp (see config_renderer.dhcp_commands)."""
+        await self.push_config(self.renderer.render(self.device, 'dhcp'))
+
+
+async def configure_devices(devices: Iterable[Device], max_concurrency: int = 100,
+                            device_timeout: float = 300, **kwargs) -> Dict[str, Dict[str, Any]]:
+    """
+    Run the SSH configuration (interfaces, routing, DHCP) of many devices on the running event loop.
+
+    Args:
+        devices (Iterable[Device]): Devices to configure; FTD and devices without ssh are skipped.
+        max_concurrency (int): Maximum number of SSH sessions open at the same time.
+        device_timeout (float): Upper bound in seconds for the whole configuration of one device.
+        **kwargs: Forwarded to AsyncSSHConnector (timeout, batch, chunk_size...).
+            Without a renderer, one ConfigRenderer is shared by all devices.
+
+    Returns:
+        dict: Per-device results, e.g. {'CSR': {'status': 'success', 'elapsed': 3.1, 'error': None}}.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    kwargs.setdefault('renderer', ConfigRenderer())
+
+    async def configure(dev: Device) -> Tuple[str, Dict[str, Any]]:
+        async with semaphore:
+            start_time = time.perf_counter()
+            ssh = AsyncSSHConnector(dev, **kwargs)
+            error: Optional[str] = None
+            try:
+                await asyncio.wait_for(_connect_and_configure(ssh), timeout=device_timeout)
+            except asyncio.TimeoutError:
+                error = f"SSH configuration did not finish within {device_timeout} seconds."
+            except Exception as e:
+                error = str(e)
+            finally:
+                try:
+                    await ssh.disconnect()
+                except Exception:
+                    pass
+            return dev.name, {
+                'status': 'failed' if error else 'success',
+                'elapsed': time.perf_counter() - start_time,
+                'error': error,
+            }
+
+    targets: List[Device] = [dev for dev in devices if 'ssh' in dev.connections and dev.os != 'ftd']
+    return dict(await asyncio.gather(*(configure(dev) for dev in targets)))
+
+
+async def _connect_and_configure(ssh: AsyncSSHConnector) -> None:
+    await ssh.connect()
+    await ssh.configure_interfaces()
+    await ssh.configure_routing()
+    await ssh.configure_dhcp()
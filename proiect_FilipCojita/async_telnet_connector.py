@@ -0,0 +1,255 @@
+"""
+async_telnet_connector is the asyncio version of telnet_connector2, used to run
+the console bootstrap of many devices from a single event loop.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import telnetlib3
+from pyats.datastructures import AttrDict
+from pyats.topology import Device
+
+from config_renderer import ConfigRenderer, CRYPTO_KEY_COMMAND, CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE
+from prompt_registry import prompt_matcher
+from telnet_connector2 import TelnetConnector2
+
+logger = logging.getLogger(__name__)
+
+# Disable propagation to prevent pyATS from double-logging
+logger.propagate = False
+
+# Configure only if no handlers exist (prevent duplicates)
+if not logger.handlers:
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('> %(message)s'))  # Simple arrow prefix
+    logger.addHandler(handler)
+
+
+class AsyncTelnetConnector:
+    """
+    Telnet connector with the same surface as TelnetConnector2, where every call that
+    touches the network is a coroutine.
+    """
+    # bytes of already scanned output that are scanned again, for prompts split between chunks
+    SCAN_WINDOW: int = 256
+
+    def __init__(self, device: Device, **kwargs) -> None:
+        """
+        Initialize with a pyATS Device object.
+
+        Args:
+            device (Device): pyATS device object to connect to.
+            **kwargs: Optional timeouts overriding the TelnetConnector2 defaults (timeout,
+                autoinstall_timeout, crypto_key_timeout, eula_timeout), and the
+                ConfigRenderer rendering the bootstrap commands (renderer).
+        """
+        self.device: Device = device
+        self.connection: Optional[AttrDict] = None
+        self._reader: Optional[telnetlib3.TelnetReader] = None
+        self._writer: Optional[telnetlib3.TelnetWriter] = None
+        self._buffer = bytearray()
+        self.timeout: float = kwargs.get('timeout', TelnetConnector2.DEFAULT_TIMEOUT)
+        self.autoinstall_timeout: float = kwargs.get('autoinstall_timeout', TelnetConnector2.AUTOINSTALL_TIMEOUT)
+        self.crypto_key_timeout: float = kwargs.get('crypto_key_timeout', TelnetConnector2.CRYPTO_KEY_TIMEOUT)
+        self.eula_timeout: float = kwargs.get('eula_timeout', TelnetConnector2.EULA_TIMEOUT)
+        self.renderer: ConfigRenderer = kwargs.get('renderer') or ConfigRenderer()
+
+    async def connect(self, **kwargs: Any) -> None:
+        """
+        Establish a telnet connection using provided connection info.
+        """
+        self.connection = kwargs.get('connection')
+        if not self.connection:
+            raise ValueError("Missing connection information.")
+
+        self._reader, self._writer = await asyncio.wait_for(
+            telnetlib3.open_connection(
+                self.connection.ip.compressed,
+                self.connection.port,
+                encoding=False,
+                connect_minwait=0,
+                connect_maxwait=0.5,
+            ),
+            timeout=self.timeout,
+        )
+
+    def is_connected(self) -> bool:
+        """
+        Check if telnet connection is active.
+        """
+        return self._writer is not None and not self._reader.at_eof()
+
+    async def disconnect(self) -> None:
+        """
+        Close the telnet connection if open.
+        """
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def write(self, command: str) -> None:
+        """
+        Sends a command to the device.
+        """
+        self._writer.write(command.encode() + b'\n')
+
+    async def expect_any(self, command: Optional[str], **kwargs: Any) -> Tuple[int, str]:
+        """
+        Send a command (None sends nothing) and wait for any of the given prompts.
+
+        Data received after the matched prompt is kept for the next call.
+
+        Args:
+            command (Optional[str]): Command to send before waiting.
+            **kwargs: prompt (list of regex strings) and timeout (seconds).
+
+        Returns:
+            Tuple[int, str]: Index of the matched prompt (-1 on timeout) and the output read.
+        """
+        if not self._writer:
+            raise RuntimeError("Connection not established. Call connect() first.")
+        matcher = prompt_matcher(kwargs.get('prompt', []))
+        if command is not None:
+            self.write(command)
+            logger.info(command)
+
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + kwargs.get('timeout', self.timeout)
+        scan_from = 0
+        while True:
+            match = matcher.search(self._buffer, scan_from)
+            if match is not None:
+                output = bytes(self._buffer[:match.end()])
+                del self._buffer[:match.end()]
+                return matcher.index(match), output.decode(errors="ignore")
+
+            remaining = end_time - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(self._reader.read(4096), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                raise RuntimeError("Connection closed unexpectedly during command execution.")
+            scan_from = max(0, len(self._buffer) - self.SCAN_WINDOW)
+            self._buffer += chunk
+
+        output = bytes(self._buffer)
+        self._buffer.clear()
+        return -1, output.decode(errors="ignore")
+
+    async def execute(self, command: str, **kwargs: Any) -> str:
+        """
+        Execute a command over telnet and wait for prompt(s).
+        """
+        try:
+            return (await self.expect_any(command, **kwargs))[1]
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error executing command '{command}': {e}")
+
+    async def try_skip_initial_config_dialog(self) -> None:
+        """
+        Checks if autoconfiguration is in progress and cancels if so.
+        """
+        index, _ = await self.expect_any('', prompt=[r'initial configuration dialog\?', r'\[yes/no\]:',
+                                                     r'[\w.\-]+>', r'[\w.\-]+#'])
+        if index in (0, 1):
+            await self.execute('no', prompt=[r'terminate autoinstall\? \[yes\]:'])
+            await self.execute('yes', prompt=[r'Press RETURN to get started'], timeout=self.autoinstall_timeout)
+            await self.execute('\r', prompt=[r'\w+\>'])
+
+    async def do_initial_configuration(self) -> None:
+        """
+        Perform initial device configuration based on device OS.
+        """
+        if self.device.os in ['ios', 'iosxe']:
+            await self._initial_conf_router()
+        elif self.device.os == 'ftd':
+            await self._initial_conf_ftd()
+
+    async def _initial_conf_router(self) -> None:
+        """
+        Perform initial configuration on Cisco IOS or IOS-XE routers.
+        Same steps as TelnetConnector2._initial_conf_router.
+        """
+        await self.try_skip_initial_config_dialog()
+
+        for command, prompt in self.renderer.render(self.device, 'bootstrap'):
+            if command == CRYPTO_KEY_COMMAND:
+                # key generation may first ask to replace the existing keys
+                index, _ = await self.expect_any(command, prompt=[CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE],
+                                                 timeout=self.crypto_key_timeout)
+                if index == 1:
+                    index, _ = await self.expect_any('yes', prompt=[CRYPTO_KEY_DONE], timeout=self.crypto_key_timeout)
+                if index == -1:
+                    raise RuntimeError("Timeout generating the RSA keys on the console.")
+                continue
+            await self.execute(command, prompt=[prompt])
+
+    async def _initial_conf_ftd(self) -> None:
+        """
+        Initial configuration for Firepower Threat Defense (FTD) devices.
+        Same dialog as TelnetConnector2._initial_conf_ftd.
+        """
+        for command, prompt in self.renderer.render(self.device, 'login'):
+            await self.execute(command, prompt=[prompt])
+
+        # page through the EULA: one space key per --MORE-- prompt
+        index, _ = await self.expect_any('\n', prompt=['--MORE--', 'AGREE to the EULA:'], timeout=self.eula_timeout)
+        while index == 0:
+            self._writer.write(b' ')  # write space key
+            index, _ = await self.expect_any(None, prompt=['--MORE--', 'AGREE to the EULA:'], timeout=self.eula_timeout)
+        if index == -1:
+            raise RuntimeError("Timeout paging the EULA on the FTD console.")
+
+        for command, prompt in self.renderer.render(self.device, 'setup'):
+            await self.execute(command, prompt=[prompt])
+
+
+async def bootstrap_devices(devices: Iterable[Device], max_concurrency: int = 100,
+                            device_timeout: float = 600) -> Dict[str, Dict[str, Any]]:
+    """
+    Run the console bootstrap of many devices concurrently on the running event loop.
+
+    Args:
+        devices (Iterable[Device]): Devices to bootstrap; devices without a telnet connection are skipped.
+        max_concurrency (int): Maximum number of consoles driven at the same time.
+        device_timeout (float): Upper bound in seconds for the whole bootstrap of one device.
+
+    Returns:
+        dict: Per-device results, e.g. {'CSR': {'status': 'success', 'elapsed': 41.2, 'error': None}}.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    renderer = ConfigRenderer()
+
+    async def bootstrap(dev: Device) -> Tuple[str, Dict[str, Any]]:
+        async with semaphore:
+            start_time = time.perf_counter()
+            connector = AsyncTelnetConnector(dev, renderer=renderer)
+            error: Optional[str] = None
+            try:
+                await asyncio.wait_for(_connect_and_configure(connector), timeout=device_timeout)
+            except asyncio.TimeoutError:
+                error = f"Bootstrap did not finish within {device_timeout} seconds."
+            except Exception as e:
+                error = str(e)
+            finally:
+                await connector.disconnect()
+            return dev.name, {
+                'status': 'failed' if error else 'success',
+                'elapsed': time.perf_counter() - start_time,
+                'error': error,
+            }
+
+    targets: List[Device] = [dev for dev in devices if 'telnet' in dev.connections]
+    return dict(await asyncio.gather(*(bootstrap(dev) for dev in targets)))
+
+
+async def _connect_and_configure(connector: AsyncTelnetConnector) -> None:
+    await connector.connect(connection=connector.device.connections.telnet)
+    await connector.do_initial_configuration()
@@ -11,7 +11,57 @@ Author: [Cojita Filip](https://github.com/filipcojita)
 from pyats.datastructures import AttrDict
 import ipaddress
 
-def compute_default_gateway(dev):
+
+class TopologyIndex:
+    """
+    Lookup tables of a testbed's topology, built in one pass over every interface.
+
+    Attributes:
+        aliases (dict): Interfaces of each device by alias, e.g. {'CSR': {'initial': <Interface>}}.
+        links (dict): Endpoints of each link (keyed by id of the link object),
+            e.g. {id(link): [(<Device CSR>, <Interface Gi1>), (<Device IOU1>, <Interface Et0/1>)]}.
+        link_ips (dict): IPv4 address of each device on each link, e.g. {id(link): {'IOU1': '192.168.11.1'}}.
+    """
+
+    def __init__(self, tb):
+        self.aliases = {}
+        self.links = {}
+        self.link_ips = {}
+        for dev in tb.devices.values():
+            by_alias = self.aliases.setdefault(dev.name, {})
+            for iface in (getattr(dev, 'interfaces', None) or {}).values():
+                alias = getattr(iface, 'alias', None)
+                # keep the first interface of an alias, like a scan of the interfaces would
+                if alias and alias not in by_alias:
+                    by_alias[alias] = iface
+                link = getattr(iface, 'link', None)
+                if not link:
+                    continue
+                self.links.setdefault(id(link), []).append((dev, iface))
+                if getattr(iface, 'ipv4', None):
+                    self.link_ips.setdefault(id(link), {}).setdefault(dev.name, iface.ipv4.ip.compressed)
+
+    def interface(self, dev, alias):
+        """Return the interface of `dev` with the given alias, or None."""
+        return self.aliases.get(dev.name, {}).get(alias)
+
+    def neighbors(self, dev, iface):
+        """Return the (device, interface) pairs of the other devices on the link of `iface`."""
+        link = getattr(iface, 'link', None)
+        if not link:
+            return []
+        return [(neighbor, neighbor_iface) for neighbor, neighbor_iface in self.links.get(id(link), [])
+                if neighbor.name != dev.name]
+
+    def neighbor_ip(self, dev, iface):
+        """Return the IPv4 address of the first other device on the link of `iface`, or None."""
+        link = getattr(iface, 'link', None)
+        if not link:
+            return None
+        return next((ip for name, ip in self.link_ips.get(id(link), {}).items() if name != dev.name), None)
+
+
+def compute_default_gateway(dev, index=None):
     """
     Compute the default gateway IP address for a device based on its initial interface link.
 
@@ -20,19 +70,18 @@ def compute_default_gateway(dev):
 
     Args:
         dev: A pyATS Device object.
+        index: TopologyIndex of the device's testbed; built on the fly when not given.
+            Pass a shared index when computing the gateway of many devices.
 
     Returns:
         str or None: The IP address of the neighbor device on the same link, or None if not found.
     """
-    initial_iface = next((iface for iface in dev.interfaces.values() if iface.alias == 'initial'), None)
-    if initial_iface and hasattr(initial_iface, 'link') and initial_iface.link:
-        linked_devices = initial_iface.link.connected_devices
-        for neighbor_dev in linked_devices:
-            if neighbor_dev.name != dev.name:
-                for neighbor_iface in neighbor_dev.interfaces.values():
-                    if neighbor_iface.link == initial_iface.link:
-                        return neighbor_iface.ipv4.ip.compressed
-    return None
+    if index is None:
+        index = TopologyIndex(dev.testbed)
+    initial_iface = index.interface(dev, 'initial')
+    if initial_iface is None:
+        return None
+    return index.neighbor_ip(dev, initial_iface)
 
 def autofill_missing_data(tb):
     """
@@ -48,6 +97,9 @@ def autofill_missing_data(tb):
     Args:
         tb: A pyATS testbed object (loaded with `loader.load()`).
     """
+    # one pass over the topology serves the lookups of every device
+    index = TopologyIndex(tb)
+
     for dev in tb.devices.values():
         # Skip Linux and FTD devices (handled differently)
         if dev.os in ['linux', 'ftd']:
@@ -79,7 +131,7 @@ def autofill_missing_data(tb):
 
         # If SSH connection missing, infer from initial interface
         if 'ssh' not in dev.connections and hasattr(dev, 'interfaces') and dev.interfaces:
-            initial_iface = next((iface for iface in dev.interfaces.values() if iface.alias == 'initial'), None)
+            initial_iface = index.interface(dev, 'initial')
             if initial_iface:
                 dev.connections.ssh = AttrDict()
                 dev.connections.ssh.ip = initial_iface.ipv4.ip
@@ -91,7 +143,7 @@ def autofill_missing_data(tb):
 
         # Compute and set a default static gateway route if missing
         if not hasattr(dev.custom, 'gateway'):
-            next_hop_ip = compute_default_gateway(dev)
+            next_hop_ip = compute_default_gateway(dev, index)
             if next_hop_ip:
                 dev.custom.gateway = {
                     'dest': '192.168.11.0',  # UbuntuServer address
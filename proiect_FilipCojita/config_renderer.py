@@ -0,0 +1,310 @@
+"""
+config_renderer turns a pyATS Device into the ordered (command, prompt) lists
+sent by the Telnet and SSH connectors.
+
+Rendering is pure (no I/O), so a whole fleet can be rendered up front, cached
+for the run and benchmarked offline; the connectors only stream the result.
+"""
+import ipaddress
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pyats.topology import Device
+
+# (command, expected prompt) pairs, as sent by execute() or streamed by send_config_batch()
+ConfigCommands = List[Tuple[str, str]]
+
+# RSA key generation is interactive: it either finishes with "[OK] (elapsed time was N seconds)"
+# followed, possibly after blank or %SSH-5-ENABLED syslog lines, by the prompt, or first asks
+# to replace the existing keys
+CRYPTO_KEY_COMMAND = 'crypto key generate rsa modulus 2048'
+CRYPTO_KEY_DONE = r'\[OK\][\s\S]*?\(config\)#'
+CRYPTO_KEY_REPLACE = r'replace them\?'
+
+
+def device_prompt(device: Device) -> str:
+    """Regex matching the exec or any config-mode prompt of the device."""
+    hostname = getattr(device, 'custom', {}).get('hostname')
+    name = re.escape(hostname) if hostname else r'[\w.\-]+'
+    return rf'{name}(?:\([\w\-]+\))?#'
+
+
+def bootstrap_commands(device: Device) -> ConfigCommands:
+    """
+    Render the console bootstrap of an IOS/IOS-XE router: initial interface and route,
+    hostname, RSA keys, local user, SSH on the VTY lines and enable secret, then save.
+
+    The CRYPTO_KEY_COMMAND line is answered by the transport (see CRYPTO_KEY_REPLACE).
+
+    Args:
+        device (Device): pyATS device holding the 'initial' interface, credentials and custom section.
+
+    Returns:
+        ConfigCommands: Ordered (command, prompt) pairs, from the exec prompt to 'write memory'.
+    """
+    interface = device.interfaces['initial']
+    ip = interface.ipv4.ip.compressed
+    mask = interface.ipv4.network.netmask.exploded
+    hostname = device.custom.hostname
+
+    commands = [
+        ("\n", r'>'),
+        ("en", r'#'),
+        ('conf t', r'\(config.*\)#'),
+        # configure initial interface
+        (f"int {interface.name}", r'\(config-if\)#'),
+        (f"ip add {ip} {mask}", r'\(config-if\)#'),
+        ('no shut', r'\(config-if\)#'),
+        ('exit', r'\(config\)#'),
+    ]
+
+    # configure initial route
+    if 'gateway' in device.custom:
+        commands.append((f'ip route {device.custom.gateway["dest"]} {mask} {device.custom.gateway["next_hop"]}',
+                         r'\(config\)#'))
+
+    # configure ssh on device
+    username = device.credentials.default.username
+    password = device.credentials.default.password.plaintext
+    enable_password = device.credentials.enable.password.plaintext
+    commands += [
+        (f'hostname {hostname}', r'\(config\)#'),
+        ('ip domain name localdomain', r'\(config\)#'),
+        (CRYPTO_KEY_COMMAND, CRYPTO_KEY_DONE),
+        (f'username {username} privilege 15 secret {password}', r'\(config\)#'),
+        ('line vty 0 4', r'\(config-line\)#'),
+        ("transport input ssh", r'\(config-line\)#'),
+        ("login local", r'\(config-line\)#'),
+        ('exit', r'\(config\)#'),
+        ('ip ssh version 2', r'\(config\)#'),
+        ('ip scp server enable', r'\(config\)#'),
+        (f'enable secret {enable_password}', r'\(config\)#'),
+        ('end', rf'{hostname}#'),
+        ('write memory', rf'\[OK\]|{hostname}#'),
+        ('', rf'{hostname}#'),
+    ]
+    return commands
+
+
+def interface_commands(device: Device) -> ConfigCommands:
+    """
+    Render the interface configuration (addresses and ip helpers) of a device.
+
+    Args:
+        device (Device): pyATS device holding the interfaces and the custom section.
+
+    Returns:
+        ConfigCommands: Ordered (command, prompt) pairs, from 'configure terminal' to 'end'.
+    """
+    commands = [('configure terminal', r'\(config\)#')]
+    for iface in device.interfaces.values():
+        if getattr(iface, 'alias', None) == 'initial':
+            continue
+        ip = iface.ipv4.ip.compressed
+        mask = iface.ipv4.network.netmask.exploded
+        commands += [
+            (f"interface {iface.name}", r'\(config-if\)#'),
+            (f"ip address {ip} {mask}", r'\(config-if\)#'),
+            ('no shutdown', r'\(config-if\)#'),
+            ('exit', r'\(config\)#'),
+        ]
+
+    # ip-helper condition
+    if 'ip_helper' in device.custom:
+        for iface_name, iface in device.interfaces.items():
+            # Check if the interface's alias matches the next_hop
+            if hasattr(iface, 'alias') and iface.alias == device.custom['ip_helper']['next_hop']:
+                commands += [
+                    (f'interface {iface_name}', r'\(config-if\)#'),
+                    (f'ip helper-address {device.custom["ip_helper"]["ip"]}', r'\(config-if\)#'),
+                    ('exit', r'\(config\)#'),
+                ]
+
+    commands.append(('end', r'#'))
+    return commands
+
+
+def routing_commands(device: Device) -> ConfigCommands:
+    """
+    Render the static routes of a device, or OSPF on all its interfaces if it has none.
+
+    Args:
+        device (Device): pyATS device holding the interfaces and the custom section.
+
+    Returns:
+        ConfigCommands: Ordered (command, prompt) pairs, from 'configure terminal' to 'end'.
+    """
+    commands = [('configure terminal', r'\(config\)#')]
+
+    if hasattr(device.custom, 'static_routes') and device.custom.static_routes:
+        for route in device.custom.static_routes:
+            commands.append((f"ip route {route['dest']} {route['mask']} {route['next_hop']}", r'\(config\)#'))
+    else:
+        area = getattr(device.custom, 'ospf_area', 0)
+        commands.append(('router ospf 1', r'\(config-router\)#'))
+
+        for iface in device.interfaces.values():
+            network = iface.ipv4.network.network_address
+            netmask = iface.ipv4.network.netmask
+            wildcard = ipaddress.IPv4Address((2 ** 32 - 1) - int(netmask))
+            commands.append((f'network {network} {wildcard} area {area}', r'\(config-router\)#'))
+
+    commands.append(('end', r'#'))
+    return commands
+
+
+def dhcp_commands(device: Device) -> ConfigCommands:
+    """
+    Render the DHCP pools defined under custom.dhcp (empty list if there are none).
+
+    Args:
+        device (Device): pyATS device holding the custom section.
+
+    Returns:
+        ConfigCommands: Ordered (command, prompt) pairs, from 'configure terminal' to 'end'.
+    """
+    if "dhcp" not in device.custom:
+        return []
+
+    commands = [("configure terminal", r'\(config\)#')]
+    for pool in device.custom["dhcp"]:
+        pool_name = f"POOL_{pool['network'].replace('.', '_')}"
+        commands += [
+            (f"ip dhcp excluded-address {pool['excluded'][0]} {pool['excluded'][1]}", r'\(config\)#'),
+            (f"ip dhcp pool {pool_name}", r'\(dhcp-config\)#'),
+            (f"network {pool['network']} {pool['mask']}", r'\(dhcp-config\)#'),
+            (f"default-router {pool['default_router']}", r'\(dhcp-config\)#'),
+            (f"dns-server {pool['dns_server']}", r'\(dhcp-config\)#'),
+            ('exit', r'\(config\)#'),
+        ]
+    commands.append(('end', r'#'))
+    return commands
+
+
+def ftd_login_commands(device: Device) -> ConfigCommands:
+    """
+    Render the first FTD console login, up to the EULA (paged by the transport).
+    """
+    return [
+        ('', 'firepower login:'),
+        ('admin', 'Password:'),
+        ('Admin123', 'Press <ENTER> to display the EULA:'),
+    ]
+
+
+def ftd_setup_commands(device: Device) -> ConfigCommands:
+    """
+    Render the answers to the FTD setup wizard shown after the EULA: new admin password,
+    management address and gateway, hostname, DNS servers and local management.
+    """
+    password = device.connections.ssh.credentials.login.password.plaintext
+    mgmt = device.interfaces['mgmt']
+    return [
+        ('', 'Enter new password:'),
+        (f'{password}', 'Confirm new password:'),
+        (f'{password}', 'Do you want to configure IPv4\\? \\(y/n\\) \\[y\\]:'),
+        ('y', 'Do you want to configure IPv6\\? \\(y/n\\) \\[n\\]:'),
+        ('n', 'Configure IPv4 via DHCP or manually\\? \\(dhcp/manual\\) \\[manual\\]:'),
+        ('manual', 'Enter an IPv4 address for the management interface \\[192\\.168\\.45\\.45\\]:'),
+        (mgmt.ipv4.ip.compressed, 'Enter an IPv4 netmask for the management interface \\[255\\.255\\.255\\.0\\]'),
+        (mgmt.ipv4.netmask.compressed,
+         'Enter the IPv4 default gateway for the management interface \\[192\\.168\\.45\\.1\\]:'),
+        (f'{ftd_gateway(device)}', 'Enter a fully qualified hostname for this system \\[firepower\\]:'),
+        (f'{device.custom.hostname}',
+         'Enter a comma-separated list of DNS severs or \'none\' \\[200\\.67\\.222\\.222\\,208\\.67\\.220\\.220\\]'),
+        (f'{device.custom.dns}', 'Enter a comma-separated list of search domains or \'none\' \\[\\]'),
+        ('none', 'Manage the device locally\\? \\(yes/no\\) \\[yes\\]:'),
+        ('yes', '>'),
+    ]
+
+
+def ftd_gateway(device: Device) -> Optional[str]:
+    """
+    Find the gateway IP of an FTD: the address of the other device on its management link.
+    """
+    link_obj = device.interfaces['mgmt'].link
+    for dev in link_obj.connected_devices:
+        if dev == device:
+            continue
+        for interface in dev.interfaces.values():
+            int_found = interface if interface.link == link_obj else None
+            if int_found:
+                return int_found.ipv4.ip.compressed
+    return None
+
+
+Renderer = Callable[[Device], ConfigCommands]
+
+_IOS_PHASES: Dict[str, Renderer] = {
+    'bootstrap': bootstrap_commands,
+    'interfaces': interface_commands,
+    'routing': routing_commands,
+    'dhcp': dhcp_commands,
+}
+
+# render functions of every phase, per device OS
+RENDERERS: Dict[str, Dict[str, Renderer]] = {
+    'ios': _IOS_PHASES,
+    'iosxe': _IOS_PHASES,
+    'ftd': {
+        'login': ftd_login_commands,
+        'setup': ftd_setup_commands,
+    },
+}
+
+
+class ConfigRenderer:
+    """
+    Renders and caches the configuration of devices, phase by phase.
+
+    Each (device, phase) is rendered once per renderer, so one renderer should live
+    for one run over a testbed that no longer changes (i.e. after autofill).
+    """
+
+    def __init__(self) -> None:
+        self._cache: Dict[Tuple[str, str], ConfigCommands] = {}
+
+    def render(self, device: Device, phase: str) -> ConfigCommands:
+        """
+        Render one phase of a device.
+
+        Args:
+            device (Device): The device to render.
+            phase (str): Phase name from RENDERERS, e.g. 'bootstrap', 'interfaces', 'routing', 'dhcp'.
+
+        Returns:
+            ConfigCommands: The (command, prompt) pairs of the phase.
+
+        Raises:
+            ValueError: If the phase does not exist for the device OS.
+        """
+        key = (device.name, phase)
+        commands = self._cache.get(key)
+        if commands is None:
+            renderer = RENDERERS.get(device.os, {}).get(phase)
+            if renderer is None:
+                raise ValueError(f"No '{phase}' rendering for os '{device.os}' ({device.name}).")
+            commands = self._cache[key] = renderer(device)
+        return commands
+
+    def render_fleet(self, devices: Iterable[Device],
+                     phases: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, ConfigCommands]]:
+        """
+        Render every phase (or the given phases) of every device with a known OS.
+
+        Returns:
+            dict: Commands per device and phase, e.g. {'CSR': {'interfaces': [...], 'routing': [...]}}.
+        """
+        phases = list(phases) if phases is not None else None
+        fleet = {}
+        for device in devices:
+            table = RENDERERS.get(device.os)
+            if table is None:
+                continue
+            fleet[device.name] = {phase: self.render(device, phase)
+                                  for phase in (phases if phases is not None else table) if phase in table}
+        return fleet
+
+    def clear(self) -> None:
+        """Forget every rendered configuration."""
+        self._cache.clear()
@@ -3,22 +3,27 @@ The configuration includes creating security zones, assigning IPv4 addresses to
 creating network objects, access rules, static routes, and deploying the final setup."""
 
 import ssl
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pyats import aetest
 from pyats.aetest.steps import Steps
-from pyats.topology import loader
 from swagger_connector import SwaggerConnector
+from fdm_inventory import FdmInventory
+from fdm_deploy import deploy
+from testbed_cache import load_testbed
 
 # Disable SSL verification to allow connections to FDM with self-signed certificates
 ssl._create_default_https_context = ssl._create_unverified_context
 
 # Load testbed and retrieve the device named 'FTD'
-tb = loader.load('mytopo.yaml')
+tb = load_testbed('mytopo.yaml')
 device = tb.devices['FTD']
 
+# Seconds to wait for the deployment to finish
+DEPLOY_DEADLINE = 600
 
-def create_security_zone(steps: Steps, swagger: SwaggerConnector):
+
+def create_security_zone(steps: Steps, swagger: SwaggerConnector, inventory: FdmInventory):
     """
     Creates a security zone named 'AutoCreated1' and assigns it to a physical interface,
     unless the interface is already assigned to an existing zone.
@@ -26,8 +31,8 @@ def create_security_zone(steps: Steps, swagger: SwaggerConnector):
     with steps.start('Creating Security Zone'):
         already_configured = False
 
-        # Retrieve all existing security zones from FDM
-        security_zones = swagger.client.SecurityZone.getSecurityZoneList().result().items
+        # Existing security zones from the inventory snapshot
+        security_zones = inventory.items('security_zones')
 
         # Check if GigabitEthernet0/1 is already in a zone
         for zone in security_zones:
@@ -41,7 +46,7 @@ def create_security_zone(steps: Steps, swagger: SwaggerConnector):
         # If not already assigned, create and assign the security zone
         if not already_configured:
             ref = swagger.client.get_model('ReferenceModel')
-            phy = swagger.client.Interface.getPhysicalInterfaceList().result()['items'][2]
+            phy = inventory.items('interfaces')[2]
             security_zone = swagger.client.get_model('SecurityZone')
             sz = security_zone(
                 name='AutoCreated1',
@@ -55,13 +60,13 @@ def create_security_zone(steps: Steps, swagger: SwaggerConnector):
                     )
                 ]
             )
-            result = swagger.client.SecurityZone.addSecurityZone(body=sz).result()
+            result = inventory.update('security_zones', swagger.client.SecurityZone.addSecurityZone(body=sz).result())
             print(result)
         else:
             print("Interface GigabitEthernet0/1 is already included in a SecurityZone. Skipping.")
 
 
-def configure_interfaces(steps: Steps, swagger: SwaggerConnector):
+def configure_interfaces(steps: Steps, swagger: SwaggerConnector, inventory: FdmInventory):
     """
     Configures static IPv4 addresses on FTD interfaces based on the pyATS testbed file.
     """
@@ -73,8 +78,8 @@ def configure_interfaces(steps: Steps, swagger: SwaggerConnector):
             'GigabitEthernet0/3'
         ]
 
-        # Retrieve list of existing physical interfaces
-        existing_interfaces = swagger.client.Interface.getPhysicalInterfaceList().result()['items']
+        # Existing physical interfaces from the inventory snapshot (copied, edits replace entries)
+        existing_interfaces = list(inventory.items('interfaces'))
 
         for obj in existing_interfaces:
             if obj.hardwareName in interfaces_to_configure:
@@ -102,10 +107,10 @@ def configure_interfaces(steps: Steps, swagger: SwaggerConnector):
                 obj.name = dev_iface.alias if dev_iface.alias else iface_name
 
                 print(f"[INFO] Configuring {iface_name} with IP {obj.ipv4.ipAddress.ipAddress}")
-                swagger.client.Interface.editPhysicalInterface(objId=obj.id, body=obj).result()
+                inventory.update('interfaces', swagger.client.Interface.editPhysicalInterface(objId=obj.id, body=obj).result())
 
 
-def create_access_rules(steps: Steps, swagger: SwaggerConnector):
+def create_access_rules(steps: Steps, swagger: SwaggerConnector, inventory: FdmInventory):
     """
     Adds an access rule named 'Allow_Some' that permits all traffic to the 'AutoCreated1' security zone.
     """
@@ -115,11 +120,10 @@ def create_access_rules(steps: Steps, swagger: SwaggerConnector):
         security_zone_model = swagger.client.get_model('SecurityZone')
 
         # Retrieve ID of the first access policy
-        policy_list_id = swagger.client.AccessPolicy.getAccessPolicyList().result().items[0].id
+        policy_list_id = inventory.items('access_policies')[0].id
 
         # Check for duplicate rules
-        access_rules = swagger.client.AccessPolicy.getAccessRuleList(parentId=policy_list_id).result().items
-        if len([rule for rule in access_rules if rule.name == rule_name]) == 0:
+        if inventory.get('access_rules', rule_name, parentId=policy_list_id) is None:
             model = swagger.client.get_model('AccessRule')
             res = swagger.client.AccessPolicy.addAccessRule(
                 parentId=policy_list_id,
@@ -133,100 +137,114 @@ def create_access_rules(steps: Steps, swagger: SwaggerConnector):
                     ]
                 )
             )
-            print(res.result())
+            print(inventory.update('access_rules', res.result(), parentId=policy_list_id))
         else:
             print(f"Access Rule: {rule_name} already exists. Skipping.")
 
 
-def create_network_objects(steps: Steps, swagger: SwaggerConnector):
+def create_network_objects(steps: Steps, swagger: SwaggerConnector, inventory: FdmInventory, max_workers: int = 8):
     """
-    Defines network and host objects for other nodes in the topology such as IOU2, CSR, Ubuntu, etc.
+    Reconciles the network and host objects listed under the FTD's custom.network_objects
+    in the testbed: existing objects are read from the inventory (indexed by name), then only
+    the missing ones are created (concurrently) and the ones with a different value or subType updated.
+    An object that fails is reported once all the others are done.
     """
-    with steps.start('Creating Network Objects needed for Static Route'):
+    with steps.start('Creating Network Objects needed for Static Route') as step:
         model = swagger.client.get_model('NetworkObject')
-        network_objects = swagger.client.NetworkObject.getNetworkObjectList().result().items
+        desired = device.custom.get('network_objects', [])
+        existing = {obj['name']: inventory.get('network_objects', obj['name']) for obj in desired}
 
-        # Add host objects if not present
-        if len([obj for obj in network_objects if obj.name == 'IOU']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="IOU", subType="HOST", value="192.168.103.1")
-            ).result()
-        if len([obj for obj in network_objects if obj.name == 'CSR']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="CSR", subType="HOST", value="192.168.106.1")
-            ).result()
-        if len([obj for obj in network_objects if obj.name == 'IOSv']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="IOSv", subType="HOST", value="192.168.107.1")
-            ).result()
-        if len([obj for obj in network_objects if obj.name == 'IOU2']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="IOU2", subType="HOST", value="192.168.121.1")
-            ).result()
+        missing = [obj for obj in desired if existing[obj['name']] is None]
+        changed = [obj for obj in desired if existing[obj['name']] is not None and
+                   (existing[obj['name']].value, existing[obj['name']].subType) != (obj['value'], obj['subType'])]
 
-        # Add network objects
-        if len([obj for obj in network_objects if obj.name == 'UbuntuServerNetwork']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="UbuntuServerNetwork", subType="NETWORK", value="192.168.11.0/24")
-            ).result()
-        if len([obj for obj in network_objects if obj.name == 'DNSNetwork']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="DNSNetwork", subType="NETWORK", value="192.168.108.0/24")
-            ).result()
-        if len([obj for obj in network_objects if obj.name == 'DockerGuest1Network']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="DockerGuest1Network", subType="NETWORK", value="192.168.105.0/24")
-            ).result()
-        if len([obj for obj in network_objects if obj.name == 'IOU2Network']) == 0:
-            swagger.client.NetworkObject.addNetworkObject(
-                body=model(name="IOU2Network", subType="NETWORK", value="192.168.121.0/24")
+        def add(obj):
+            return swagger.client.NetworkObject.addNetworkObject(
+                body=model(name=obj['name'], subType=obj['subType'], value=obj['value'])
             ).result()
 
-
-def create_static_routes(steps: Steps, swagger: SwaggerConnector):
+        def edit(obj):
+            current = existing[obj['name']]
+            current.subType = obj['subType']
+            current.value = obj['value']
+            return swagger.client.NetworkObject.editNetworkObject(objId=current.id, body=current).result()
+
+        results = []
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(add, obj): obj['name'] for obj in missing}
+            futures.update({pool.submit(edit, obj): obj['name'] for obj in changed})
+            for future in as_completed(futures):
+                try:
+                    results.append(inventory.update('network_objects', future.result()))
+                except Exception as e:
+                    errors[futures[future]] = str(e)
+
+        print(f"Network objects: {len(missing)} created, {len(changed)} updated, "
+              f"{len(desired) - len(missing) - len(changed)} already up to date.")
+        if errors:
+            step.failed("Network objects not applied: " +
+                        ', '.join(f"{name} ({error})" for name, error in sorted(errors.items())))
+        return results
+
+
+def create_static_routes(steps: Steps, swagger: SwaggerConnector, inventory: FdmInventory):
     """
     Creates static routes from the FTD to other subnets via specific interfaces and next-hop gateways.
+    Routes already on the virtual router (same interface and networks) are skipped when their
+    gateway matches, and edited otherwise.
     """
     with steps.start('Configuring static route'):
         model = swagger.client.get_model('StaticRouteEntry')
-        v_router = swagger.client.Routing.getVirtualRouterList().result()['items'][0]
+        v_router = inventory.items('virtual_routers')[0]
 
         ref = swagger.client.get_model('ReferenceModel')
-        network_objects = swagger.client.NetworkObject.getNetworkObjectList().result().items
-        interface_objects = swagger.client.Interface.getPhysicalInterfaceList().result()['items']
 
         # Match network objects by name
-        csr_host_obj = next(filter(lambda o: o.name == 'CSR', network_objects))
-        iosv_host_obj = next(filter(lambda o: o.name == 'IOSv', network_objects))
-        iou2_host_obj = next(filter(lambda o: o.name == 'IOU', network_objects))
-        ubuntu_server_network = next(filter(lambda o: o.name == 'UbuntuServerNetwork', network_objects))
+        csr_host_obj = inventory.get('network_objects', 'CSR')
+        iosv_host_obj = inventory.get('network_objects', 'IOSv')
+        iou2_host_obj = inventory.get('network_objects', 'IOU')
+        ubuntu_server_network = inventory.get('network_objects', 'UbuntuServerNetwork')
 
         # Match interfaces by alias
-        outside_interface = next(filter(lambda o: o.name == 'outside', interface_objects))
-        iosv_interface = next(filter(lambda o: o.name == 'iosv', interface_objects))
-        iou2_interface = next(filter(lambda o: o.name == 'iou2', interface_objects))
+        outside_interface = inventory.get('interfaces', 'outside')
+        iosv_interface = inventory.get('interfaces', 'iosv')
+        iou2_interface = inventory.get('interfaces', 'iou2')
+
+        # Existing routes of the virtual router, by interface and destination networks
+        existing = {_route_key(route.iface, route.networks): route
+                    for route in inventory.items('static_routes', parentId=v_router.id)}
 
         def add_route(interface, gateway):
-            # Add static route using interface and next-hop reference
-            swagger.client.Routing.addStaticRouteEntry(
-                parentId=v_router.id,
-                body=model(
-                    gateway=ref(id=gateway.id, name=gateway.name, type=gateway.type),
-                    iface=ref(
-                        id=interface.id,
-                        name=interface.name,
-                        hardwareName=interface.hardwareName,
-                        type=interface.type
-                    ),
-                    ipType="IPv4",
-                    type='staticrouteentry',
-                    networks=[ref(
-                        id=ubuntu_server_network.id,
-                        name=ubuntu_server_network.name,
-                        type=ubuntu_server_network.type
-                    )]
-                )
-            )
+            networks = [ubuntu_server_network]
+            gateway_ref = ref(id=gateway.id, name=gateway.name, type=gateway.type)
+            current = existing.get(_route_key(interface, networks))
+
+            if current is None:
+                # Add static route using interface and next-hop reference
+                result = swagger.client.Routing.addStaticRouteEntry(
+                    parentId=v_router.id,
+                    body=model(
+                        gateway=gateway_ref,
+                        iface=ref(
+                            id=interface.id,
+                            name=interface.name,
+                            hardwareName=interface.hardwareName,
+                            type=interface.type
+                        ),
+                        ipType="IPv4",
+                        type='staticrouteentry',
+                        networks=[ref(id=network.id, name=network.name, type=network.type) for network in networks]
+                    )
+                ).result()
+            elif current.gateway.id != gateway.id:
+                current.gateway = gateway_ref
+                result = swagger.client.Routing.editStaticRouteEntry(
+                    parentId=v_router.id, objId=current.id, body=current).result()
+            else:
+                print(f"Static route via {interface.name} and {gateway.name} already exists. Skipping.")
+                return
+            inventory.update('static_routes', result, parentId=v_router.id)
 
         # Apply the static routes
         add_route(outside_interface, csr_host_obj)
@@ -234,6 +252,10 @@ def create_static_routes(steps: Steps, swagger: SwaggerConnector):
         add_route(iou2_interface, iou2_host_obj)
 
 
+def _route_key(interface, networks) -> tuple:
+    return interface.id, tuple(sorted(network.id for network in networks))
+
+
 def configure_fdm(steps: Steps):
     """
     Entry point for full REST configuration of the FTD via FDM Swagger API.
@@ -243,35 +265,30 @@ def configure_fdm(steps: Steps):
         swagger: SwaggerConnector = device.connections.rest['class'](device)
         swagger.connect(connection=device.connections.rest)
 
+    # every FDM collection is listed once per run and shared by the steps below
+    inventory = FdmInventory(swagger.client)
+
     with steps.start('Changing DHCP server'):
-        dhcp_servers = swagger.client.DHCPServerContainer.getDHCPServerContainerList().result()
-        for dhcp_server in dhcp_servers['items']:
+        for dhcp_server in list(inventory.items('dhcp_servers')):
             dhcp_server.servers = []  # Clear existing DHCP entries
             result = swagger.client.DHCPServerContainer.editDHCPServerContainer(
                 objId=dhcp_server.id,
                 body=dhcp_server
             ).result()
-            print(result)
+            print(inventory.update('dhcp_servers', result))
 
     # Call each config step
-    create_security_zone(steps, swagger)
-    configure_interfaces(steps, swagger)
-    create_network_objects(steps, swagger)
-    create_static_routes(steps, swagger)
+    create_security_zone(steps, swagger, inventory)
+    configure_interfaces(steps, swagger, inventory)
+    create_network_objects(steps, swagger, inventory)
+    create_static_routes(steps, swagger, inventory)
 
     # Deploy the configuration
-    with steps.start('Deploying configuration'):
-        response = swagger.client.Deployment.addDeployment().result()
-        for _ in range(10):
-            time.sleep(3)
-            tasks = swagger.client.Deployment.getDeployment(objId=response.id).result()
-            if len(tasks['deploymentStatusMessages']) == 0:
-                continue
-            status = tasks['deploymentStatusMessages'][-1]
-            if status['taskState'] == "FINISHED":
-                break
-        else:
-            print("Deployment failed or is taking too much time.")
+    with steps.start('Deploying configuration') as step:
+        try:
+            deploy(swagger.client, device.name, deadline=DEPLOY_DEADLINE)
+        except (RuntimeError, TimeoutError) as e:
+            step.failed(str(e))
 
 
 class REST_config(aetest.Testcase):
@@ -0,0 +1,130 @@
+"""
+dependency_scheduler orders the devices of a testbed so that every device is
+configured after the devices its management traffic is routed through.
+
+A device depends on the owner of each next hop of its custom.gateway and
+custom.static_routes entries (FTD included, when it is the transit hop), and on
+the local Ubuntu host, whose routes make the lab reachable at all. The
+neighbour behind the custom.ip_helper interface is a weaker dependency: it is
+only kept when it does not close a cycle.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+from autofill_engine import TopologyIndex
+
+
+def _is_local_host(dev) -> bool:
+    return dev.os == 'linux' and dev.type == 'ubuntu'
+
+
+def _next_hops(dev) -> List[str]:
+    custom = dev.custom or {}
+    hops = []
+    gateway = custom.get('gateway')
+    if gateway and gateway.get('next_hop'):
+        hops.append(str(gateway['next_hop']))
+    for route in custom.get('static_routes') or []:
+        if route.get('next_hop'):
+            hops.append(str(route['next_hop']))
+    return hops
+
+
+def _depends_on(dependencies: Dict[str, Set[str]], name: str, target: str) -> bool:
+    """True if `name` already depends, directly or not, on `target`."""
+    seen = set()
+    stack = [name]
+    while stack:
+        current = stack.pop()
+        if current == target:
+            return True
+        if current not in seen:
+            seen.add(current)
+            stack.extend(dependencies.get(current, ()))
+    return False
+
+
+def build_dependencies(tb, index: Optional[TopologyIndex] = None) -> Dict[str, Set[str]]:
+    """
+    Build the dependency graph of the testbed devices.
+
+    Args:
+        tb: A pyATS testbed object (autofilled, so custom.gateway is set).
+        index: TopologyIndex of the testbed; built when not given.
+
+    Returns:
+        dict: The devices each device depends on, e.g. {'CSR': {'IOU1', 'ubuntu-host'}, 'IOU1': {'ubuntu-host'}}.
+    """
+    if index is None:
+        index = TopologyIndex(tb)
+
+    # owner of every interface address, from the topology links
+    owners: Dict[str, str] = {}
+    for ips in index.link_ips.values():
+        for name, ip in ips.items():
+            owners.setdefault(ip, name)
+
+    local_hosts = {name for name, dev in tb.devices.items() if _is_local_host(dev)}
+    dependencies: Dict[str, Set[str]] = {name: set() for name in tb.devices}
+    for name, dev in tb.devices.items():
+        if name in local_hosts:
+            continue
+        dependencies[name].update(local_hosts)
+        for hop in _next_hops(dev):
+            owner = owners.get(hop)
+            if owner and owner != name and owner in dependencies:
+                dependencies[name].add(owner)
+
+    # ip helper neighbours, only where they do not close a cycle
+    for name, dev in tb.devices.items():
+        helper = (dev.custom or {}).get('ip_helper')
+        iface = index.interface(dev, helper.get('next_hop')) if helper else None
+        if iface is None:
+            continue
+        for neighbor, _ in index.neighbors(dev, iface):
+            if neighbor.name in dependencies and not _depends_on(dependencies, neighbor.name, name):
+                dependencies[name].add(neighbor.name)
+    return dependencies
+
+
+def topological_waves(dependencies: Dict[str, Set[str]], names: Optional[Iterable[str]] = None) -> List[List[str]]:
+    """
+    Split devices into waves (Kahn's algorithm): every device comes after all the devices
+    it depends on, and the devices of one wave do not depend on each other.
+
+    Dependencies on devices outside `names` are ignored. Devices left in a cycle are
+    put together in a last wave.
+
+    Args:
+        dependencies (dict): Output of build_dependencies.
+        names (Optional[Iterable[str]]): Devices to schedule (all by default), in testbed order.
+
+    Returns:
+        list: The waves, e.g. [['ubuntu-host'], ['IOU1', 'FTD'], ['CSR', 'IOSv']].
+    """
+    names = list(names) if names is not None else list(dependencies)
+    selected = set(names)
+    pending = {name: dependencies.get(name, set()) & selected for name in names}
+    dependents: Dict[str, List[str]] = {name: [] for name in names}
+    for name, deps in pending.items():
+        for dep in deps:
+            dependents[dep].append(name)
+
+    remaining = {name: len(deps) for name, deps in pending.items()}
+    wave = [name for name in names if remaining[name] == 0]
+    waves = []
+    while wave:
+        waves.append(wave)
+        ready = set()
+        for name in wave:
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.add(dependent)
+        wave = [name for name in names if name in ready]
+
+    scheduled = {name for wave in waves for name in wave}
+    cycle = [name for name in names if name not in scheduled]
+    if cycle:
+        print(f"[WARN] Circular management dependencies between {', '.join(cycle)}; configuring them last.")
+        waves.append(cycle)
+    return waves
@@ -0,0 +1,100 @@
+"""
+fdm_deploy starts FDM deployments and waits for them with exponential backoff,
+streaming every new deployment status message as soon as it is seen.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from bravado.client import SwaggerClient
+
+SUCCESS_STATES = frozenset({'FINISHED', 'DEPLOYED'})
+FAILURE_STATES = frozenset({'FAILED', 'DEPLOY_FAILED', 'CANCELLED'})
+
+
+def watch_deployment(client: SwaggerClient, deployment_id: str, deadline: float = 600, *, initial_delay: float = 0.5,
+                     max_delay: float = 15, factor: float = 2, jitter: float = 0.2,
+                     sleep: Callable[[float], None] = time.sleep,
+                     clock: Callable[[], float] = time.monotonic) -> Iterator[Dict[str, Any]]:
+    """
+    Poll a deployment until it finishes, yielding each new deploymentStatusMessages entry.
+
+    The delay between polls starts at initial_delay and grows by factor up to max_delay,
+    with +/- jitter (a fraction of the delay) so many watchers do not poll in lockstep.
+    It goes back to initial_delay whenever new messages arrive.
+
+    Args:
+        client (SwaggerClient): bravado client of the FDM.
+        deployment_id (str): Id returned by Deployment.addDeployment.
+        deadline (float): Seconds after which the wait is abandoned.
+
+    Raises:
+        RuntimeError: If the deployment ends in a failure state.
+        TimeoutError: If it does not finish within the deadline.
+    """
+    end_time = clock() + deadline
+    delay = initial_delay
+    seen = 0
+    while True:
+        messages = client.Deployment.getDeployment(objId=deployment_id).result()['deploymentStatusMessages'] or []
+        if len(messages) > seen:
+            yield from messages[seen:]
+            seen = len(messages)
+            delay = initial_delay
+
+        state = messages[-1]['taskState'] if messages else None
+        if state in SUCCESS_STATES:
+            return
+        if state in FAILURE_STATES:
+            raise RuntimeError(f"Deployment {deployment_id} ended in state {state}.")
+
+        remaining = end_time - clock()
+        if remaining <= 0:
+            raise TimeoutError(f"Deployment {deployment_id} did not finish within {deadline} seconds (last state: {state}).")
+        sleep(min(remaining, delay * random.uniform(1 - jitter, 1 + jitter)))
+        delay = min(max_delay, delay * factor)
+
+
+def deploy(client: SwaggerClient, name: str = 'FTD', **kwargs) -> List[Dict[str, Any]]:
+    """
+    Start a deployment and wait for it, printing the status messages as they arrive.
+
+    Args:
+        client (SwaggerClient): bravado client of the FDM.
+        name (str): Device name used in the printed messages.
+        **kwargs: Forwarded to watch_deployment (deadline, initial_delay, max_delay...).
+
+    Returns:
+        list: Every status message of the deployment.
+    """
+    deployment = client.Deployment.addDeployment().result()
+    messages = []
+    for message in watch_deployment(client, deployment.id, **kwargs):
+        print(f"[{name}] Deployment {message['taskState']}: {message.get('statusMessage', '')}")
+        messages.append(message)
+    return messages
+
+
+def deploy_all(clients: Dict[str, SwaggerClient], max_workers: Optional[int] = None,
+               **kwargs) -> Dict[str, Dict[str, Any]]:
+    """
+    Deploy on many FTDs at once and wait for all of them.
+
+    Args:
+        clients (dict): bravado client of each FTD, keyed by device name.
+        max_workers (Optional[int]): Number of deployments awaited at the same time (all by default).
+        **kwargs: Forwarded to watch_deployment.
+
+    Returns:
+        dict: Per-device results, e.g. {'FTD': {'status': 'success', 'messages': [...], 'error': None}}.
+    """
+    def run(name: str) -> Dict[str, Any]:
+        try:
+            return {'status': 'success', 'messages': deploy(clients[name], name, **kwargs), 'error': None}
+        except Exception as e:
+            return {'status': 'failed', 'messages': [], 'error': str(e)}
+
+    if not clients:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(clients), thread_name_prefix='fdm-deploy') as pool:
+        return dict(zip(clients, pool.map(run, clients)))
@@ -0,0 +1,117 @@
+"""
+fdm_inventory keeps one snapshot of the FDM objects used while configuring an FTD,
+so every configuration step reads from memory instead of listing them again.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from bravado.client import SwaggerClient
+
+
+def fetch_all_items(list_operation, page_size: int = 100, **kwargs) -> list:
+    """
+    Fetches every page of an FDM list operation (e.g. NetworkObject.getNetworkObjectList).
+    """
+    items = []
+    offset = 0
+    while True:
+        page = list_operation(offset=offset, limit=page_size, **kwargs).result()
+        items.extend(page['items'])
+        if len(page['items']) < page_size:
+            return items
+        offset += page_size
+
+
+class FdmInventory:
+    """
+    Snapshot of FDM collections, each loaded once and indexed by name, hardwareName and id.
+
+    Write steps pass the objects returned by FDM to update(), so the snapshot stays
+    current without listing the collection again.
+
+    Attributes:
+        client (SwaggerClient): bravado client of the FDM.
+        page_size (int): Page size used when a collection is loaded.
+    """
+
+    # collection name -> (bravado resource, list operation)
+    COLLECTIONS: Dict[str, Tuple[str, str]] = {
+        'interfaces': ('Interface', 'getPhysicalInterfaceList'),
+        'network_objects': ('NetworkObject', 'getNetworkObjectList'),
+        'security_zones': ('SecurityZone', 'getSecurityZoneList'),
+        'access_policies': ('AccessPolicy', 'getAccessPolicyList'),
+        'access_rules': ('AccessPolicy', 'getAccessRuleList'),
+        'virtual_routers': ('Routing', 'getVirtualRouterList'),
+        'static_routes': ('Routing', 'getStaticRouteEntryList'),
+        'dhcp_servers': ('DHCPServerContainer', 'getDHCPServerContainerList'),
+    }
+    INDEX_KEYS: Tuple[str, ...] = ('name', 'hardwareName', 'id')
+
+    def __init__(self, client: SwaggerClient, page_size: int = 100) -> None:
+        self.client = client
+        self.page_size = page_size
+        self._items: Dict[tuple, List[Any]] = {}
+        self._indexes: Dict[tuple, Dict[str, Dict[Any, Any]]] = {}
+
+    def items(self, collection: str, **parent: Any) -> List[Any]:
+        """
+        All objects of a collection, loaded from FDM on first use.
+
+        Args:
+            collection (str): One of COLLECTIONS.
+            **parent: Parent id of nested collections, e.g. parentId for access_rules.
+        """
+        key = self._key(collection, parent)
+        if key not in self._items:
+            resource, operation = self.COLLECTIONS[collection]
+            list_operation = getattr(getattr(self.client, resource), operation)
+            self._items[key] = fetch_all_items(list_operation, self.page_size, **parent)
+            self._indexes[key] = {field: {} for field in self.INDEX_KEYS}
+            for obj in self._items[key]:
+                self._index(key, obj)
+        return self._items[key]
+
+    def get(self, collection: str, value: Any, by: str = 'name', **parent: Any) -> Optional[Any]:
+        """
+        Look up one object of a collection by name (default), hardwareName or id.
+
+        Returns:
+            The object, or None if the collection has no such object.
+        """
+        self.items(collection, **parent)
+        return self._indexes[self._key(collection, parent)][by].get(value)
+
+    def update(self, collection: str, obj: Any, **parent: Any) -> Any:
+        """
+        Add or replace an object (matched by id) with the version returned by a write call.
+
+        Returns:
+            The object, so write calls can be wrapped: inventory.update(..., client.X.add(...).result()).
+        """
+        items = self.items(collection, **parent)
+        key = self._key(collection, parent)
+        old = self._indexes[key]['id'].get(obj.id)
+        if old is not None:
+            items[items.index(old)] = obj
+            for field in self.INDEX_KEYS:
+                self._indexes[key][field].pop(self._field(old, field), None)
+        else:
+            items.append(obj)
+        self._index(key, obj)
+        return obj
+
+    def _index(self, key: tuple, obj: Any) -> None:
+        for field in self.INDEX_KEYS:
+            value = self._field(obj, field)
+            if value is not None:
+                self._indexes[key][field][value] = obj
+
+    @staticmethod
+    def _field(obj: Any, field: str) -> Any:
+        # bravado models raise AttributeError for properties their type does not define
+        try:
+            return getattr(obj, field)
+        except AttributeError:
+            return None
+
+    @staticmethod
+    def _key(collection: str, parent: Dict[str, Any]) -> tuple:
+        return (collection,) + tuple(sorted(parent.items()))
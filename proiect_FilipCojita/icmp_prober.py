@@ -0,0 +1,180 @@
+"""
+icmp_prober sends ICMP echo requests to many IPv4 targets over a single socket,
+without starting a ping process per target.
+
+An unprivileged datagram ICMP socket is used where the kernel allows it
+(net.ipv4.ping_group_range), and a raw socket otherwise (needs root or CAP_NET_RAW).
+"""
+import errno
+import os
+import selectors
+import socket
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+def icmp_checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071) of an ICMP message."""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+class IcmpProber:
+    """
+    Multiplexes ICMP echo probes to any number of targets over one socket.
+
+    Attributes:
+        count (int): Echo requests sent to each target.
+        timeout (float): Seconds to wait for replies after the last request is sent.
+        interval (float): Seconds between two rounds of requests.
+        payload_size (int): Bytes of payload in each request.
+    """
+
+    def __init__(self, count: int = 2, timeout: float = 2.0, interval: float = 0.2, payload_size: int = 56) -> None:
+        if count < 1:
+            raise ValueError("count must be at least 1.")
+        self.count = count
+        self.timeout = timeout
+        self.interval = interval
+        self.payload_size = payload_size
+        self.identifier = os.getpid() & 0xffff
+        self._raw = False
+        # state of the probe run in progress
+        self._sock: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._pending: Dict[Tuple[str, int], float] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _open_socket(self) -> socket.socket:
+        """
+        Open a datagram ICMP socket, falling back to a raw one.
+
+        Raises:
+            PermissionError: If neither kind of ICMP socket is allowed.
+        """
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self._raw = False
+        except PermissionError:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self._raw = True
+        sock.setblocking(False)
+        return sock
+
+    def _packet(self, sequence: int) -> bytes:
+        payload = bytes(self.payload_size)
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence)
+        checksum = icmp_checksum(header + payload)
+        return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, self.identifier, sequence) + payload
+
+    def _parse_reply(self, data: bytes) -> Optional[int]:
+        """Sequence number of an echo reply meant for this prober, None for any other packet."""
+        if self._raw:
+            # raw sockets also deliver the IP header and the replies of every other process
+            data = data[(data[0] & 0x0f) * 4:]
+        if len(data) < 8:
+            return None
+        icmp_type, _, _, identifier, sequence = struct.unpack('!BBHHH', data[:8])
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        # the kernel rewrites the identifier of datagram ICMP sockets and filters replies itself
+        if self._raw and identifier != self.identifier:
+            return None
+        return sequence
+
+    def probe(self, targets: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Probe every target and return its loss and round-trip times.
+
+        Args:
+            targets (Iterable[str]): IPv4 addresses; duplicates are probed once.
+
+        Returns:
+            dict: Per-target statistics, e.g.
+                {'10.0.0.1': {'sent': 2, 'received': 2, 'loss': 0.0,
+                              'rtt_min': 0.4, 'rtt_avg': 0.5, 'rtt_max': 0.6}}
+                (times in milliseconds, None when no reply was received).
+        """
+        targets = list(dict.fromkeys(targets))
+        stats = self._stats = {ip: {'sent': 0, 'received': 0, 'rtts': []} for ip in targets}
+        # (ip, sequence) -> send time, for requests still waiting for a reply
+        pending = self._pending = {}
+        sequence = 0
+
+        sock = self._sock = self._open_socket()
+        selector = self._selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        try:
+            for round_number in range(self.count):
+                if round_number:
+                    self._receive(time.monotonic() + self.interval)
+                for ip in targets:
+                    sequence = (sequence + 1) & 0xffff
+                    packet = self._packet(sequence)
+                    while True:
+                        try:
+                            sock.sendto(packet, (ip, 0))
+                            break
+                        except BlockingIOError:
+                            # socket buffer full: collect the replies waiting to be read, then retry
+                            self._receive(time.monotonic() + 0.01)
+                        except OSError as e:
+                            if e.errno not in (errno.ENETUNREACH, errno.EHOSTUNREACH, errno.EINVAL):
+                                raise
+                            packet = None
+                            break
+                    if packet is not None:
+                        pending[(ip, sequence)] = time.monotonic()
+                    stats[ip]['sent'] += 1
+                self._receive(time.monotonic(), drain_only=True)
+
+            self._receive(time.monotonic() + self.timeout)
+        finally:
+            selector.close()
+            sock.close()
+            self._sock = self._selector = None
+            self._pending = {}
+            self._stats = {}
+
+        return {ip: self._summary(entry) for ip, entry in stats.items()}
+
+    def _receive(self, deadline: float, drain_only: bool = False) -> None:
+        """Read replies until the deadline, or until nothing is pending (or readable, with drain_only)."""
+        sock, selector, pending, stats = self._sock, self._selector, self._pending, self._stats
+        while pending:
+            remaining = deadline - time.monotonic()
+            if not selector.select(max(remaining, 0)):
+                if drain_only or remaining <= 0:
+                    return
+                continue
+            while True:
+                try:
+                    data, address = sock.recvfrom(65535)
+                except BlockingIOError:
+                    break
+                received_at = time.monotonic()
+                sent_at = pending.pop((address[0], self._parse_reply(data)), None)
+                if sent_at is not None:
+                    stats[address[0]]['received'] += 1
+                    stats[address[0]]['rtts'].append((received_at - sent_at) * 1000)
+
+    @staticmethod
+    def _summary(entry: Dict[str, Any]) -> Dict[str, Any]:
+        rtts: List[float] = entry['rtts']
+        sent = entry['sent']
+        return {
+            'sent': sent,
+            'received': entry['received'],
+            'loss': 1 - entry['received'] / sent if sent else 1.0,
+            'rtt_min': round(min(rtts), 3) if rtts else None,
+            'rtt_avg': round(sum(rtts) / len(rtts), 3) if rtts else None,
+            'rtt_max': round(max(rtts), 3) if rtts else None,
+        }
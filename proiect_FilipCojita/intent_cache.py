@@ -0,0 +1,147 @@
+"""
+intent_cache remembers, across runs, which configuration intent was last applied
+successfully to every device, so unchanged devices can be skipped on a rerun.
+
+The intent of a device is fingerprinted from its interfaces, custom section,
+credentials, connections and rendered configuration (routes included). The
+routes of the local Ubuntu host come from the rest of the testbed, so its
+fingerprint includes the generated route map.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from pyats.topology import Device
+from pyats.utils.secret_strings import SecretString
+
+from config_renderer import ConfigRenderer
+from ubuntu_setup import UbuntuNetworkConfigurator
+
+DEFAULT_STATE_FILE = '.provisioning_state.json'
+
+
+def _plain(value: Any) -> Any:
+    """Convert testbed data (AttrDicts, credentials, addresses, links...) to JSON-friendly values."""
+    if isinstance(value, SecretString):
+        # str() is masked; the digest changes with the secret without writing it to the state file
+        return 'sha256:' + hashlib.sha256(value.plaintext.encode()).hexdigest()
+    if hasattr(value, 'items'):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        items = [_plain(item) for item in value]
+        return sorted(items, key=str) if isinstance(value, set) else items
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _rendered_config(dev: Device, renderer: ConfigRenderer) -> Optional[list]:
+    """Configuration lines pushed over SSH, or None for devices not configured that way."""
+    if 'ssh' not in dev.connections or dev.os == 'ftd':
+        return None
+    try:
+        return [command for phase in ('interfaces', 'routing', 'dhcp')
+                for command, _ in renderer.render(dev, phase)]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        # incomplete interface data: the raw interfaces below still cover the intent
+        return None
+
+
+def _generated_routes(dev: Device) -> Optional[dict]:
+    """Routes the Ubuntu host derives from the other devices, or None for any other device."""
+    if dev.os != 'linux' or dev.type != 'ubuntu' or getattr(dev, 'testbed', None) is None:
+        return None
+    if (dev.custom or {}).get('network_config', {}).get('routes'):
+        # explicit routes are already part of the custom section
+        return None
+    return UbuntuNetworkConfigurator.generate_routes_from_testbed(dev.testbed, dev.name)
+
+
+def device_fingerprint(dev: Device, renderer: Optional[ConfigRenderer] = None) -> str:
+    """
+    Hash everything that decides how a device gets configured.
+
+    Args:
+        dev (Device): The (autofilled) device.
+        renderer (Optional[ConfigRenderer]): Renderer of the run, so the rendered
+            configuration is reused by the connectors.
+
+    Returns:
+        str: Hex SHA-256 digest, equal across runs as long as the intent is unchanged.
+    """
+    interfaces = {
+        name: {
+            'ipv4': _plain(getattr(iface, 'ipv4', None)),
+            'alias': getattr(iface, 'alias', None),
+            'link': getattr(getattr(iface, 'link', None), 'name', None),
+        }
+        for name, iface in (getattr(dev, 'interfaces', None) or {}).items()
+    }
+    connections = {
+        name: {key: _plain(connection.get(key)) for key in ('protocol', 'ip', 'port')}
+        for name, connection in (dev.connections or {}).items() if hasattr(connection, 'get')
+    }
+    intent = {
+        'os': dev.os,
+        'type': dev.type,
+        'interfaces': interfaces,
+        'custom': _plain(dev.custom or {}),
+        'credentials': _plain(getattr(dev, 'credentials', None) or {}),
+        'connections': connections,
+        'rendered': _rendered_config(dev, renderer or ConfigRenderer()),
+        'routes': _generated_routes(dev),
+    }
+    encoded = json.dumps(intent, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class IntentCache:
+    """
+    State file of the last apply of each device: its fingerprint and its result.
+
+    Attributes:
+        path (str): Location of the JSON state file.
+        state (dict): Per-device entries, e.g.
+            {'CSR': {'fingerprint': '3f1a...', 'status': 'success', 'applied_at': '2024-05-01T10:00:00+00:00'}}.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_FILE) -> None:
+        self.path = path
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path) as file:
+                    self.state = json.load(file)
+            except (OSError, ValueError):
+                # a damaged state file only costs a full run
+                self.state = {}
+
+    def is_current(self, name: str, fingerprint: str) -> bool:
+        """True if the device was last applied successfully with this exact intent."""
+        entry = self.state.get(name)
+        return bool(entry) and entry.get('fingerprint') == fingerprint and entry.get('status') == 'success'
+
+    def record(self, name: str, fingerprint: str, result: Dict[str, Any]) -> None:
+        """Store the outcome of applying the intent to a device."""
+        with self._lock:
+            self.state[name] = {
+                'fingerprint': fingerprint,
+                'status': result.get('status'),
+                'errors': result.get('errors', {}),
+                'applied_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            }
+
+    def save(self) -> None:
+        """Write the state file (atomically, so an interrupted run never leaves it half written)."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as file:
+                json.dump(self.state, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -2,16 +2,16 @@
 usage file - configure 1 specific device from topology
 """
 from pyats import aetest
-from pyats.topology import loader
 
 from autofill_engine import autofill_missing_data
 from ubuntu_setup import UbuntuNetworkConfigurator
 from telnet_connector2 import TelnetConnector2
 from ssh_connector_paramiko import SSHConnectorParamiko
+from testbed_cache import load_testbed
 
 
 # Load the topology
-tb = loader.load('mytopo.yaml')
+tb = load_testbed('mytopo.yaml')
 
 # Specify the device name here
 DEVICE_NAME = 'ubuntu-host'  # Change this as needed
@@ -28,7 +28,7 @@ class OneDeviceTelnetSSHTest(aetest.Testcase):
         if dev.os == 'linux' and dev.type == 'ubuntu':
             print(f"[Ubuntu] Running local configuration for {dev}")
             try:
-                ubuntu = UbuntuNetworkConfigurator(dev, testbed_path="mytopo.yaml")
+                ubuntu = UbuntuNetworkConfigurator(dev, testbed_path=tb)
                 ubuntu.configure()
             except Exception as e:
                 print(f"[Ubuntu] Error configuring {dev}: {e}")
@@ -1,20 +1,21 @@
 """
-5 tests using unittest library and MagicMock for the network automation project.
+Tests using unittest library and MagicMock for the network automation project.
 
 This suite covers:
 - SSH and Telnet command execution via connectors
 - Interface attribute validation
 - Route duplication detection on Ubuntu devices
-- Behavior of the autofill engine
+- Behavior of the autofill engine and its topology index
 - Execution timeout handling in SSHConnectorParamiko
 """
 
+import json
 import unittest
 from unittest.mock import patch, MagicMock
 from ipaddress import ip_address
 from pyats.datastructures import AttrDict
 from pyats.topology import Device, Testbed, Interface
-from autofill_engine import autofill_missing_data
+from autofill_engine import autofill_missing_data, compute_default_gateway, TopologyIndex
 from ubuntu_setup import UbuntuNetworkConfigurator
 from ssh_connector_paramiko import SSHConnectorParamiko
 from telnet_connector2 import TelnetConnector2
@@ -64,6 +65,47 @@ class TestUbuntuConfiguratorRouteDuplication(unittest.TestCase):
         # check that route_exists was called exactly once
         mock_check.assert_called_once_with('192.168.99.0/24')
 
+    @patch('ubuntu_setup.subprocess.run')
+    def test_batch_mode_adds_only_missing_routes_once(self, mock_run):
+        """
+        In batch mode the routing table is read once and only the missing routes
+        are sent, in a single 'ip -batch' call.
+        """
+        routing_table = json.dumps([
+            {'dst': 'default', 'gateway': '192.168.1.1', 'dev': 'eth0'},
+            {'dst': '192.168.99.0/24', 'gateway': '192.168.1.1', 'dev': 'eth0'},
+        ])
+
+        def fake_run(cmd, **kwargs):
+            return MagicMock(returncode=0, stdout=routing_table if cmd[:2] == ['ip', '-j'] else '', stderr='')
+        mock_run.side_effect = fake_run
+
+        dev = Device(name="UbuntuHost")
+        dev.custom = {
+            'network_config': {
+                'interface': 'eth0',
+                'ip': '192.168.1.10/24',
+                'gateway': '192.168.1.1',
+                'routes': {'dup': '192.168.99.0/24', 'new-1': '192.168.11.0/24', 'new-2': '192.168.12.0/24'}
+            }
+        }
+        UbuntuNetworkConfigurator(dev, batch=True).configure()
+
+        commands = [call_args[0][0] for call_args in mock_run.call_args_list]
+        self.assertEqual(commands.count(['ip', '-j', 'route', 'show']), 1)
+        self.assertFalse([cmd for cmd in commands if cmd[:3] == ['sudo', 'ip', 'route']])
+        batch_calls = [call_args for call_args in mock_run.call_args_list if '-batch' in call_args[0][0]]
+        self.assertEqual(len(batch_calls), 1)
+        self.assertEqual(batch_calls[0].kwargs['input'],
+                         "route add 192.168.11.0/24 via 192.168.1.1\n"
+                         "route add 192.168.12.0/24 via 192.168.1.1\n")
+
+        # every route already installed: nothing is sent
+        routing_table = json.dumps([{'dst': subnet} for subnet in dev.custom['network_config']['routes'].values()])
+        mock_run.reset_mock()
+        UbuntuNetworkConfigurator(dev, batch=True).configure()
+        self.assertFalse([c for c in mock_run.call_args_list if '-batch' in c[0][0]])
+
 
 class TestSSHConnectorParamiko(unittest.TestCase):
     """
@@ -240,6 +282,22 @@ class TestSSHExecuteMethod(unittest.TestCase):
             connector.execute("show running-config", prompt="#")
         self.assertIn("Timeout executing command", str(cm.exception))
 
+    def test_prompt_split_between_chunks(self):
+        """
+        A prompt received in two separate chunks must still be detected.
+        """
+        mock_shell = MagicMock()
+        mock_shell.recv_ready.return_value = True
+        mock_shell.recv.side_effect = [b"Building configuration...\r\nem-r1(con", b"fig)#"]
+
+        connector = SSHConnectorParamiko(Device(name="SplitPrompt"))
+        connector.shell = mock_shell
+        connector._connected = True
+
+        output = connector.execute("configure terminal", prompt=r'\(config\)#')
+        self.assertTrue(output.endswith("em-r1(config)#"))
+        self.assertEqual(mock_shell.recv.call_count, 2)
+
 
 class TestAutofillMissingData(unittest.TestCase):
     """
@@ -300,5 +358,22 @@ class TestAutofillMissingData(unittest.TestCase):
         self.assertIn("gateway", dev.custom)
         self.assertEqual(dev.custom.gateway["next_hop"], "192.168.1.254")
 
+    def test_topology_index_is_built_once(self):
+        """
+        Ensure autofill builds one TopologyIndex and the index answers the gateway lookups.
+        """
+        with patch('autofill_engine.TopologyIndex', wraps=TopologyIndex) as mock_index:
+            autofill_missing_data(self.tb)
+        mock_index.assert_called_once_with(self.tb)
+
+        index = TopologyIndex(self.tb)
+        router1, router2 = self.tb.devices["Router1"], self.tb.devices["Router2"]
+        initial = index.interface(router1, 'initial')
+        self.assertIs(initial, router1.interfaces["GigabitEthernet0/0"])
+        self.assertEqual(index.neighbors(router1, initial), [(router2, router2.interfaces["GigabitEthernet0/1"])])
+        self.assertEqual(compute_default_gateway(router1, index), "192.168.1.254")
+        self.assertIsNone(compute_default_gateway(router2, index))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,450 @@
+"""
+Tests using unittest library and MagicMock for the Telnet and SSH connectors.
+
+This suite covers:
+- Batched configuration push and rejected line detection
+- Running-config parsing and delta push in diff mode
+- Async Telnet execution and bootstrap timeouts against a local console stand-in
+- Async SSH configuration against a local asyncio SSH/CLI stand-in
+- Configuration rendering separated from the Telnet and SSH transports
+- Prompt lists compiled once into a single alternation regex
+- RSA key generation dialog of the Telnet bootstrap (new keys, replaced keys, timeout)
+"""
+
+import asyncio
+import re
+import unittest
+from unittest.mock import patch, MagicMock
+from ipaddress import ip_address, ip_interface
+import asyncssh
+from pyats.datastructures import AttrDict
+from pyats.topology import Device, Interface
+from ssh_connector_paramiko import SSHConnectorParamiko
+from running_config import RunningConfig
+from config_renderer import ConfigRenderer, bootstrap_commands, CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE
+from prompt_registry import prompt_matcher
+from telnet_connector2 import TelnetConnector2
+from async_telnet_connector import AsyncTelnetConnector, bootstrap_devices
+from async_ssh_connector import configure_devices
+
+
+class TestSSHConfigBatch(unittest.TestCase):
+    """
+    Tests for SSHConnectorParamiko.send_config_batch(): one send per chunk and error parsing.
+    """
+
+    def setUp(self):
+        device = Device(name="BatchRouter")
+        device.custom = AttrDict({'hostname': 'em-r1'})
+        self.connector = SSHConnectorParamiko(device, batch=True)
+        self.connector.shell = MagicMock()
+        self.connector.shell.recv_ready.return_value = True
+        self.connector._connected = True
+        self.commands = [('configure terminal', r'\(config\)#'),
+                         ('ip route 10.0.0.0 255.0.0.0 192.168.1.1', r'\(config\)#'),
+                         ('end', r'#')]
+
+    def test_batch_sent_in_one_go(self):
+        self.connector.shell.recv.return_value = (
+            b"configure terminal\r\nEnter configuration commands, one per line.\r\n"
+            b"em-r1(config)#ip route 10.0.0.0 255.0.0.0 192.168.1.1\r\nem-r1(config)#end\r\nem-r1#")
+
+        self.connector.push_config(self.commands)
+
+        self.connector.shell.sendall.assert_called_once_with(
+            b"configure terminal\nip route 10.0.0.0 255.0.0.0 192.168.1.1\nend\n")
+
+    def test_batch_reports_rejected_lines(self):
+        self.connector.shell.recv.return_value = (
+            b"configure terminal\r\nem-r1(config)#ip route 10.0.0.0 255.0.0.0 192.168.1.1\r\n"
+            b"                  ^\r\n% Invalid input detected at '^' marker.\r\n"
+            b"\r\nem-r1(config)#end\r\nem-r1#")
+
+        with self.assertRaises(RuntimeError) as cm:
+            self.connector.send_config_batch(self.commands)
+        self.assertIn("'ip route 10.0.0.0 255.0.0.0 192.168.1.1'", str(cm.exception))
+
+
+class TestSSHConfigDiff(unittest.TestCase):
+    """
+    Tests for the diff mode of SSHConnectorParamiko: only missing lines are pushed.
+    """
+    RUNNING_CONFIG = """show running-config
+Building configuration...
+!
+hostname em-r1
+!
+interface Ethernet0/0
+ ip address 192.168.11.1 255.255.255.0
+!
+interface Ethernet0/1
+ ip address 192.168.101.1 255.255.255.0
+ shutdown
+!
+router ospf 1
+ network 192.168.11.0 0.0.0.255 area 0
+!
+ip dhcp pool POOL_192_168_117_0
+ network 192.168.117.0 255.255.255.0
+!
+ip route 192.168.11.0 255.255.255.0 192.168.101.1
+!
+end
+em-r1#"""
+
+    def setUp(self):
+        self.device = Device(name='IOU1', os='ios', custom=AttrDict({
+            'hostname': 'em-r1',
+            'static_routes': [{'dest': '192.168.11.0', 'mask': '255.255.255.0', 'next_hop': '192.168.101.1'}]}))
+        self.device.interfaces = {}
+        for name, ip in (('Ethernet0/0', '192.168.11.1'), ('Ethernet0/1', '192.168.101.1'), ('Ethernet0/2', '192.168.102.1')):
+            iface = Interface(name=name, type='ethernet')
+            iface.ipv4 = ip_interface(f'{ip}/24')
+            self.device.interfaces[name] = iface
+
+    def test_parse_builds_structured_model(self):
+        running = RunningConfig.parse(self.RUNNING_CONFIG)
+
+        self.assertEqual(running.interfaces['Ethernet0/1'], {'ip address 192.168.101.1 255.255.255.0', 'shutdown'})
+        self.assertEqual(running.routes, {'ip route 192.168.11.0 255.255.255.0 192.168.101.1'})
+        self.assertEqual(running.ospf_networks, {'1': {'network 192.168.11.0 0.0.0.255 area 0'}})
+        self.assertEqual(running.dhcp_pools, {'POOL_192_168_117_0': {'network 192.168.117.0 255.255.255.0'}})
+
+    def test_only_missing_lines_are_pushed(self):
+        connector = SSHConnectorParamiko(self.device, diff=True)
+        connector._connected = True
+        sent = []
+
+        def execute(command, prompt=None, timeout=None):
+            sent.append(command)
+            return self.RUNNING_CONFIG if command == 'show running-config' else ''
+
+        with patch.object(connector, 'execute', side_effect=execute):
+            connector.configure_routing()
+            connector.configure_interfaces()
+            self.assertEqual(sent, [
+                'terminal length 0', 'show running-config',
+                'configure terminal',
+                'interface Ethernet0/1', 'no shutdown', 'exit',
+                'interface Ethernet0/2', 'ip address 192.168.102.1 255.255.255.0', 'no shutdown', 'exit',
+                'end'])
+
+            # converged: a second run only costs the show command already made
+            sent.clear()
+            connector.configure_routing()
+            connector.configure_interfaces()
+            self.assertEqual(sent, [])
+
+    def test_write_skipped_when_nothing_changed(self):
+        connector = SSHConnectorParamiko(self.device, diff=True)
+        connector._connected = True
+        connector.running_config = RunningConfig.parse(self.RUNNING_CONFIG)
+
+        with patch.object(connector, 'execute') as mock_execute, patch('ssh_connector_paramiko.sleep') as mock_sleep:
+            connector.configure_routing()
+            connector.disconnect()
+
+        mock_execute.assert_not_called()
+        mock_sleep.assert_not_called()
+
+
+class TestConfigRenderer(unittest.TestCase):
+    """
+    Tests for ConfigRenderer: pure rendering, cached per device and phase, replayed by the transports.
+    """
+
+    @staticmethod
+    def make_device():
+        device = Device(name='CSR', os='iosxe', credentials={
+            'default': {'username': 'admin', 'password': 'cisco'},
+            'enable': {'password': 'enable'}},
+            custom=AttrDict({'hostname': 'csr1',
+                             'gateway': {'dest': '192.168.11.0', 'next_hop': '192.168.101.1'}}))
+        iface = Interface(name='GigabitEthernet1', type='ethernet')
+        iface.ipv4 = ip_interface('192.168.101.2/24')
+        device.interfaces = {'initial': iface}
+        return device
+
+    def setUp(self):
+        self.device = self.make_device()
+
+    def test_bootstrap_commands(self):
+        commands = [command for command, _ in bootstrap_commands(self.device)]
+
+        self.assertEqual(commands[:8], ['\n', 'en', 'conf t', 'int GigabitEthernet1',
+                                        'ip add 192.168.101.2 255.255.255.0', 'no shut', 'exit',
+                                        'ip route 192.168.11.0 255.255.255.0 192.168.101.1'])
+        self.assertIn('username admin privilege 15 secret cisco', commands)
+        self.assertIn('enable secret enable', commands)
+        self.assertEqual(commands[-3:], ['end', 'write memory', ''])
+
+    def test_each_phase_rendered_once(self):
+        renderer = ConfigRenderer()
+        render_bootstrap = MagicMock(return_value=[('en', '#')])
+        with patch.dict('config_renderer._IOS_PHASES', {'bootstrap': render_bootstrap}):
+            first = renderer.render_fleet([self.device], phases=['bootstrap'])
+            second = renderer.render(self.device, 'bootstrap')
+
+        render_bootstrap.assert_called_once_with(self.device)
+        self.assertEqual(first, {'CSR': {'bootstrap': [('en', '#')]}})
+        self.assertIs(second, first['CSR']['bootstrap'])
+
+    def test_unknown_phase(self):
+        with self.assertRaises(ValueError):
+            ConfigRenderer().render(self.device, 'eula')
+
+    def test_telnet_replays_bootstrap(self):
+        connector = TelnetConnector2(self.device, renderer=ConfigRenderer())
+        sent = []
+
+        def expect_any(command, **kwargs):
+            sent.append(command)
+            # the device already has RSA keys and asks to replace them
+            return (1 if kwargs['prompt'] == [CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE] else 0), ''
+
+        with patch.object(connector, 'read', return_value=''), \
+                patch.object(connector, 'try_skip_initial_config_dialog'), \
+                patch.object(connector, 'expect_any', side_effect=expect_any):
+            connector.do_initial_configuration()
+
+        expected = [command for command, _ in bootstrap_commands(self.device)]
+        crypto = expected.index('crypto key generate rsa modulus 2048')
+        self.assertEqual(sent, expected[:crypto + 1] + ['yes'] + expected[crypto + 1:])
+
+
+class FakeConsole:
+    """
+    Stand-in for a telnetlib.Telnet console: every command sent gets its scripted reply.
+    """
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.sent = []
+        self.pending = b''
+
+    def write(self, data):
+        command = data.decode().rstrip('\n')
+        self.sent.append(command)
+        self.pending = self.replies.get(command, b'')
+
+    def expect(self, regexes, timeout=None):
+        for index, regex in enumerate(regexes):
+            match = regex.search(self.pending)
+            if match:
+                return index, match, self.pending
+        return -1, None, self.pending
+
+
+class TestTelnetCryptoKeyDialog(unittest.TestCase):
+    """
+    Tests for the RSA key generation step of the Telnet bootstrap, with and without existing keys.
+    """
+    GENERATED = (b'% Generating 2048 bit RSA keys, keys will be non-exportable...\r\n'
+                 b'[OK] (elapsed time was 2 seconds)\r\n\r\n'
+                 b'*Mar  1 00:01:02.345: %SSH-5-ENABLED: SSH 1.99 has been enabled\r\n'
+                 b'csr1(config)#')
+
+    def setUp(self):
+        self.device = TestConfigRenderer.make_device()
+        self.connector = TelnetConnector2(self.device, crypto_key_timeout=1)
+
+    def bootstrap(self, replies):
+        self.connector._conn = FakeConsole(replies)
+        with patch.object(self.connector, 'read', return_value=''), \
+                patch.object(self.connector, 'try_skip_initial_config_dialog'), \
+                patch.object(self.connector, 'execute') as mock_execute:
+            try:
+                self.connector.do_initial_configuration()
+            finally:
+                self.executed = [call.args[0] for call in mock_execute.call_args_list]
+        return self.connector._conn.sent
+
+    def test_new_keys(self):
+        sent = self.bootstrap({'crypto key generate rsa modulus 2048': self.GENERATED})
+
+        self.assertEqual(sent, ['crypto key generate rsa modulus 2048'])
+        self.assertIn('username admin privilege 15 secret cisco', self.executed)
+
+    def test_existing_keys_are_replaced(self):
+        sent = self.bootstrap({
+            'crypto key generate rsa modulus 2048': b'% You already have RSA keys defined named csr1.localdomain.\r\n'
+                                                    b'% Do you really want to replace them? [yes/no]: ',
+            'yes': self.GENERATED})
+
+        self.assertEqual(sent, ['crypto key generate rsa modulus 2048', 'yes'])
+        self.assertIn('username admin privilege 15 secret cisco', self.executed)
+
+    def test_timeout_stops_the_bootstrap(self):
+        with self.assertRaises(RuntimeError):
+            self.bootstrap({'crypto key generate rsa modulus 2048': b'% Generating 2048 bit RSA keys'})
+
+        self.assertNotIn('username admin privilege 15 secret cisco', self.executed)
+
+
+class TestPromptRegistry(unittest.TestCase):
+    """
+    Tests for prompt_matcher: one shared regex per prompt list, reporting which prompt matched.
+    """
+
+    def test_lists_compiled_once(self):
+        matcher = prompt_matcher([r'\(config\)#', r'\(config-if\)#'])
+
+        self.assertIs(prompt_matcher((r'\(config\)#', r'\(config-if\)#')), matcher)
+        self.assertIs(prompt_matcher(r'#'), prompt_matcher([r'#']))
+
+    def test_earliest_prompt_and_its_index(self):
+        matcher = prompt_matcher(['--MORE--', 'AGREE to the EULA:', r'\[OK\]|#'])
+
+        match = matcher.search(b'line 1\n--MORE--\nAGREE to the EULA:')
+        self.assertEqual((matcher.index(match), match.group()), (0, b'--MORE--'))
+        match = matcher.search(b'--MORE--\nAGREE to the EULA:', 8)
+        self.assertEqual(matcher.index(match), 1)
+        match = matcher.search(b'Building configuration...\n[OK]')
+        self.assertEqual(matcher.index(match), 2)
+        self.assertIsNone(prompt_matcher([]).search(b'router#'))
+
+    @patch('telnet_connector2.telnetlib.Telnet')
+    def test_telnet_waits_on_one_regex(self, mock_telnet):
+        connector = TelnetConnector2(Device(name='R1'))
+        connector.connect(connection=AttrDict({'ip': ip_address('192.0.2.2'), 'port': 23}))
+        matcher = prompt_matcher([CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE])
+        output = b'% You already have RSA keys defined named R1.\n% Do you really want to replace them? '
+        mock_telnet.return_value.expect.return_value = (0, matcher.search(output), output)
+
+        index, _ = connector.expect_any('crypto key generate rsa modulus 2048',
+                                        prompt=[CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE])
+
+        mock_telnet.return_value.expect.assert_called_once_with([matcher.regex], timeout=connector.timeout)
+        self.assertEqual(index, 1)
+
+
+class TestAsyncTelnetConnector(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for AsyncTelnetConnector against a local asyncio stand-in for a console port.
+    """
+
+    async def asyncSetUp(self):
+        async def console(reader, writer):
+            writer.write(b"Router>")
+            buffer = b''
+            while data := await reader.read(1024):
+                # drop telnet option negotiation sent by the client
+                buffer += re.sub(rb'\xff[\xfb-\xfe].|\xff.', b'', data)
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+                    if line.strip() == b'show version':
+                        writer.write(b"show version\r\nCisco IOS Software\r\nRouter>")
+                    elif line.strip() == b'slow':
+                        await asyncio.sleep(5)
+                    await writer.drain()
+            writer.close()
+
+        self.server = await asyncio.start_server(console, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def make_device(self, name):
+        return Device(name=name, os='ios',
+                      connections={'telnet': {'ip': ip_address('127.0.0.1'), 'port': self.port}})
+
+    async def test_execute_waits_for_prompt(self):
+        connector = AsyncTelnetConnector(self.make_device('R1'))
+        await connector.connect(connection=connector.device.connections.telnet)
+        await connector.expect_any(None, prompt=[r'Router>'])
+
+        output = await connector.execute('show version', prompt=[r'Router>'])
+        await connector.disconnect()
+
+        self.assertIn('Cisco IOS Software', output)
+
+    async def test_device_timeout_is_reported(self):
+        devices = [self.make_device('R1'), self.make_device('R2')]
+
+        async def stuck(connector):
+            await connector.connect(connection=connector.device.connections.telnet)
+            await connector.execute('slow', prompt=[r'never'], timeout=5)
+
+        with patch('async_telnet_connector._connect_and_configure', stuck):
+            results = await bootstrap_devices(devices, max_concurrency=2, device_timeout=0.5)
+
+        self.assertEqual(set(results), {'R1', 'R2'})
+        for result in results.values():
+            self.assertEqual(result['status'], 'failed')
+            self.assertLess(result['elapsed'], 2)
+
+
+class FakeCLIServer(asyncssh.SSHServer):
+    """Accepts any password, for the asyncio stand-in IOS CLI below."""
+
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return True
+
+
+class TestAsyncSSHConnector(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for the async SSH phase against a local asyncio stand-in SSH/CLI server.
+    """
+
+    async def asyncSetUp(self):
+        self.received = {}
+
+        async def cli(process):
+            hostname = process.get_extra_info('username')
+            lines = self.received.setdefault(hostname, [])
+            mode = ''
+            process.stdout.write(f"{hostname}#")
+            while True:
+                line = await process.stdin.readline()
+                if not line:
+                    break
+                line = line.strip()
+                lines.append(line)
+                if line == 'configure terminal':
+                    mode = '(config)'
+                elif line.startswith(('interface', 'router', 'ip dhcp pool')):
+                    mode = {'i': '(config-if)', 'r': '(config-router)'}.get(line[0], '(dhcp-config)')
+                elif line == 'exit':
+                    mode = '(config)' if mode not in ('', '(config)') else ''
+                elif line == 'end':
+                    mode = ''
+                process.stdout.write(f"{line}\r\n{hostname}{mode}#")
+            process.exit(0)
+
+        self.server = await asyncssh.create_server(
+            FakeCLIServer, '127.0.0.1', 0, server_host_keys=[asyncssh.generate_private_key('ssh-ed25519')],
+            process_factory=cli, encoding='utf-8')
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def make_device(self, name):
+        return Device(name=name, os='ios',
+                      custom={'hostname': name, 'static_routes': [
+                          {'dest': '192.168.11.0', 'mask': '255.255.255.0', 'next_hop': '192.168.101.1'}]},
+                      connections={'ssh': {'ip': ip_address('127.0.0.1'), 'port': self.port}},
+                      credentials={'default': {'username': name, 'password': 'pass'}})
+
+    async def test_configures_devices_concurrently(self):
+        for batch in (False, True):
+            self.received.clear()
+            results = await configure_devices([self.make_device('r1'), self.make_device('r2')], batch=batch)
+
+            self.assertEqual({name: r['status'] for name, r in results.items()}, {'r1': 'success', 'r2': 'success'})
+            for name in ('r1', 'r2'):
+                self.assertIn('ip route 192.168.11.0 255.255.255.0 192.168.101.1', self.received[name])
+                self.assertEqual(self.received[name][-1], 'write')
+
+
+if __name__ == '__main__':
+    unittest.main()
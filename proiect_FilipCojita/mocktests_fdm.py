@@ -0,0 +1,432 @@
+"""
+Tests using unittest library and MagicMock for the FDM REST API helpers.
+
+This suite covers:
+- Pooled session reuse, concurrent schema download and schema cache in RESTConnector
+- FDM API spec caching and token refresh in SwaggerConnector
+- Paging and lookups of the shared FDM inventory snapshot
+- Backoff, streaming and deadline of the FDM deployment waiter
+- Reconciliation of the FDM network objects (paging, skip, edit, failed creates) and static routes
+"""
+
+import importlib
+import json
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from ipaddress import ip_address
+import requests
+from pyats.datastructures import AttrDict
+from pyats.topology import Device
+from rest_connector import RESTConnector, SchemaCache
+from swagger_connector import SwaggerConnector, FdmTokenManager
+from fdm_inventory import FdmInventory, fetch_all_items
+from fdm_deploy import watch_deployment, deploy_all
+
+
+class TestRESTConnectorSession(unittest.TestCase):
+    """
+    Verifies that RESTConnector reuses one pooled session for every request.
+    """
+
+    @patch('rest_connector.requests.Session')
+    def test_requests_share_one_session(self, mock_session_cls):
+        session = mock_session_cls.return_value
+        session.get.return_value.json.return_value = {}
+
+        connector = RESTConnector(Device(name='CSR'))
+        connector.connect(connection=AttrDict({'ip': ip_address('192.0.2.3'), 'port': 443}),
+                          username='admin', password='pass')
+        connector.get_interface('GigabitEthernet1')
+        connector.get_netconf_capabilities()
+
+        mock_session_cls.assert_called_once()
+        self.assertEqual(session.get.call_count, 2)
+        session.get.assert_any_call('https://192.0.2.3:443/restconf/data/ietf-interfaces:interfaces/interface=GigabitEthernet1')
+
+        connector.disconnect()
+        session.close.assert_called_once()
+        self.assertFalse(connector.is_connected())
+    @patch('rest_connector.requests.Session')
+    def test_fetch_schemas_adds_container_endpoints(self, mock_session_cls):
+        base = 'https://192.0.2.3:443/restconf/tailf/modules'
+        schemas = {f'{base}/ietf-interfaces/2014-05-08': 'module ietf-interfaces {\n  container interfaces {\n',
+                   f'{base}/ietf-ip/2014-06-16': 'module ietf-ip {\n  leaf forwarding;\n'}
+        mock_session_cls.return_value.get.side_effect = lambda url: MagicMock(text=schemas[url])
+        mock_session_cls.return_value.get.return_value.json.return_value = {}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            connector = RESTConnector(Device(name='CSR'), schema_cache=SchemaCache(tmp))
+            connector.connect(connection=AttrDict({'ip': ip_address('192.0.2.3'), 'port': 443}),
+                              username='admin', password='pass')
+            connector.api_endpoints = dict.fromkeys(schemas)
+            found = connector.fetch_schemas(max_workers=2)
+
+            self.assertEqual(found[f'{base}/ietf-interfaces/2014-05-08'], ['interfaces'])
+            self.assertEqual(list(connector.api_endpoints),
+                             [f'{base}/ietf-ip/2014-06-16', f'{base}/ietf-interfaces:interfaces'])
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'ietf-interfaces@2014-05-08.yang')))
+
+            # a second device running the same image finds every schema in the cache
+            mock_session_cls.return_value.get.reset_mock()
+            other = RESTConnector(Device(name='CSR2'), schema_cache=SchemaCache(tmp))
+            other.connect(connection=AttrDict({'ip': ip_address('192.0.2.4'), 'port': 443}),
+                          username='admin', password='pass')
+            other.api_endpoints = dict.fromkeys(url.replace('192.0.2.3', '192.0.2.4') for url in schemas)
+            self.assertEqual(other.fetch_schemas(), {url.replace('192.0.2.3', '192.0.2.4'): containers
+                                                     for url, containers in found.items()})
+            mock_session_cls.return_value.get.assert_not_called()
+
+    @patch('rest_connector.requests.Session')
+    def test_failed_schema_download_is_not_cached(self, mock_session_cls):
+        base = 'https://192.0.2.3:443/restconf/tailf/modules'
+        denied, good = f'{base}/ietf-interfaces/2014-05-08', f'{base}/ietf-ip/2014-06-16'
+        error = MagicMock(text='<errors>access-denied</errors>')
+        error.raise_for_status.side_effect = requests.HTTPError('401 Client Error: Unauthorized')
+        responses = {denied: [error, MagicMock(text='module ietf-interfaces {\n  container interfaces {\n')],
+                     good: [MagicMock(text='module ietf-ip {\n  container ip {\n')]}
+        mock_session_cls.return_value.get.side_effect = lambda url: responses[url].pop(0)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            connector = RESTConnector(Device(name='CSR'), schema_cache=SchemaCache(tmp))
+            connector.connect(connection=AttrDict({'ip': ip_address('192.0.2.3'), 'port': 443}),
+                              username='admin', password='pass')
+            connector.api_endpoints = dict.fromkeys([denied, good])
+
+            # the failed module is skipped, the other one is still parsed and cached
+            self.assertEqual(connector.fetch_schemas(), {good: ['ip']})
+            self.assertIn('401', connector.failed_schemas[denied])
+            self.assertIsNone(SchemaCache(tmp).get('ietf-interfaces', '2014-05-08'))
+            self.assertIsNotNone(SchemaCache(tmp).get('ietf-ip', '2014-06-16'))
+
+            # the next fetch downloads the failed schema again
+            self.assertEqual(connector.fetch_schemas([denied]), {denied: ['interfaces']})
+            self.assertEqual(connector.failed_schemas, {})
+            self.assertEqual(mock_session_cls.return_value.get.call_count, 3)
+
+    @patch('rest_connector.requests.Session')
+    def test_unexpected_error_cancels_pending_downloads(self, mock_session_cls):
+        base = 'https://192.0.2.3:443/restconf/tailf/modules'
+        urls = [f'{base}/module{i}/2024-01-01' for i in range(3)]
+        requested = []
+
+        def get(url):
+            requested.append(url)
+            if url == urls[0]:
+                raise MemoryError('out of memory')
+            # the worker may already have started the next download; it is slow enough to cancel the last
+            time.sleep(0.2)
+            return MagicMock(text='')
+        mock_session_cls.return_value.get.side_effect = get
+
+        connector = RESTConnector(Device(name='CSR'), schema_cache=None)
+        connector.connect(connection=AttrDict({'ip': ip_address('192.0.2.3'), 'port': 443}),
+                          username='admin', password='pass')
+        connector.api_endpoints = dict.fromkeys(urls)
+        with self.assertRaises(MemoryError):
+            connector.fetch_schemas(max_workers=1)
+
+        # the single worker failed on the first schema; the last queued download never ran
+        self.assertEqual(requested[0], urls[0])
+        self.assertNotIn(urls[2], requested)
+
+
+class TestSwaggerConnectorSpecCache(unittest.TestCase):
+    """
+    Verifies that the FDM API spec is downloaded once per FDM version.
+    """
+
+    @patch('swagger_connector.SwaggerClient')
+    @patch('swagger_connector.requests')
+    def test_spec_downloaded_once_per_version(self, mock_requests, mock_swagger_client):
+        mock_requests.post.return_value.json.return_value = {
+            'access_token': 'a', 'token_type': 'Bearer', 'refresh_token': 'r', 'expires_in': 1800}
+        spec_downloads = []
+
+        def get(url, **kwargs):
+            if url.endswith(SwaggerConnector.SPEC_ENDPOINT):
+                spec_downloads.append(url)
+                return MagicMock(json=MagicMock(return_value={'swagger': '2.0', 'paths': {}}))
+            return MagicMock(json=MagicMock(return_value={'softwareVersion': '7.0.0-test'}))
+        mock_requests.get.side_effect = get
+
+        with tempfile.TemporaryDirectory() as tmp, patch.object(SwaggerConnector, '_specs', {}), \
+                patch.object(SwaggerConnector, '_clients', {}):
+            for ip in ('192.0.2.10', '192.0.2.11', '192.0.2.10'):
+                connection = AttrDict({'ip': ip_address(ip), 'port': 443, 'credentials': AttrDict(
+                    {'login': AttrDict({'username': 'admin', 'password': AttrDict({'plaintext': 'pass'})})})})
+                SwaggerConnector(Device(name='FTD'), spec_cache_dir=tmp).connect(connection=connection)
+
+            self.assertEqual(len(spec_downloads), 1)
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'ngfw-7.0.0-test.json')))
+            # one client per FDM, the reconnect to 192.0.2.10 reuses the first one
+            self.assertEqual(mock_swagger_client.from_spec.call_count, 2)
+
+
+class TestFdmTokenManager(unittest.TestCase):
+    """
+    Tests for FdmTokenManager: one login shared by many workers, refresh before expiry.
+    """
+
+    @patch('swagger_connector.requests.post')
+    def test_concurrent_workers_share_one_login(self, mock_post):
+        mock_post.return_value.json.return_value = {
+            'access_token': 'a1', 'token_type': 'Bearer', 'refresh_token': 'r1', 'expires_in': 1800}
+        manager = FdmTokenManager('https://192.0.2.20:443', 'admin', 'pass')
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            headers = list(pool.map(lambda _: manager.authorization(), range(16)))
+
+        self.assertEqual(set(headers), {'Bearer a1'})
+        mock_post.assert_called_once()
+
+    @patch('swagger_connector.requests.post')
+    def test_expired_token_is_refreshed(self, mock_post):
+        mock_post.return_value.json.side_effect = [
+            {'access_token': 'a1', 'token_type': 'Bearer', 'refresh_token': 'r1', 'expires_in': 1800},
+            {'access_token': 'a2', 'token_type': 'Bearer', 'refresh_token': 'r2', 'expires_in': 1800},
+        ]
+        manager = FdmTokenManager('https://192.0.2.20:443', 'admin', 'pass')
+        manager.authorization()
+        manager._expires_at = 0  # simulate expiry
+
+        self.assertEqual(manager.authorization(), 'Bearer a2')
+        refresh_payload = json.loads(mock_post.call_args.kwargs['data'])
+        self.assertEqual(refresh_payload, {'grant_type': 'refresh_token', 'refresh_token': 'r1'})
+
+
+class TestFdmInventory(unittest.TestCase):
+    """
+    Tests for FdmInventory: every collection listed once, lookups kept current by update().
+    """
+
+    def test_collection_is_paged_once_and_indexed(self):
+        objects = [AttrDict(id=str(i), name=f'obj{i}', value=f'10.0.0.{i}') for i in range(5)]
+        client = MagicMock()
+        list_operation = client.NetworkObject.getNetworkObjectList
+        list_operation.side_effect = lambda offset, limit: MagicMock(
+            result=MagicMock(return_value={'items': objects[offset:offset + limit]}))
+        inventory = FdmInventory(client, page_size=2)
+
+        self.assertEqual(len(inventory.items('network_objects')), 5)
+        self.assertEqual(inventory.get('network_objects', 'obj4').value, '10.0.0.4')
+        self.assertIsNone(inventory.get('network_objects', 'missing'))
+        # pages of 2, 2 and 1 items; later lookups are served from memory
+        self.assertEqual(list_operation.call_count, 3)
+
+    def test_update_replaces_object_and_reindexes(self):
+        client = MagicMock()
+        client.Interface.getPhysicalInterfaceList.return_value.result.return_value = {'items': [
+            AttrDict(id='i1', name='', hardwareName='GigabitEthernet0/0')]}
+        inventory = FdmInventory(client)
+
+        inventory.update('interfaces', AttrDict(id='i1', name='outside', hardwareName='GigabitEthernet0/0'))
+
+        self.assertEqual(len(inventory.items('interfaces')), 1)
+        self.assertEqual(inventory.get('interfaces', 'outside').id, 'i1')
+        self.assertEqual(inventory.get('interfaces', 'GigabitEthernet0/0', by='hardwareName').name, 'outside')
+        self.assertIsNone(inventory.get('interfaces', ''))
+
+
+def import_fdm_script():
+    # the script loads mytopo.yaml at import; tests give it a testbed of their own
+    with patch('testbed_cache.load_testbed', return_value=AttrDict(devices={'FTD': Device(name='FTD', os='ftd')})):
+        return importlib.import_module('configure_fdm_via_rest')
+
+
+class FdmResult:
+    """Bravado future stand-in: result() returns the object or raises the error."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+class TestFdmNetworkObjects(unittest.TestCase):
+    """
+    Tests for the network object reconciliation of configure_fdm_via_rest.
+    """
+
+    def setUp(self):
+        self.script = import_fdm_script()
+        self.client = MagicMock()
+        self.client.get_model.return_value = lambda **fields: AttrDict(fields)
+        self.client.NetworkObject.getNetworkObjectList.side_effect = lambda offset, limit: FdmResult(
+            {'items': self.existing[offset:offset + limit]})
+        self.client.NetworkObject.addNetworkObject.side_effect = lambda body: FdmResult(
+            RuntimeError('422 Unprocessable Entity') if body.name == 'IOU' else AttrDict(body, id=f'id-{body.name}'))
+        self.client.NetworkObject.editNetworkObject.side_effect = lambda objId, body: FdmResult(body)
+        self.existing = [
+            AttrDict(id='n1', name='CSR', subType='HOST', value='192.168.101.2'),
+            AttrDict(id='n2', name='IOSv', subType='HOST', value='192.168.102.9'),
+            AttrDict(id='n5', name='Management', subType='HOST', value='192.168.45.0'),
+        ]
+        self.desired = [
+            {'name': 'CSR', 'subType': 'HOST', 'value': '192.168.101.2'},
+            {'name': 'IOSv', 'subType': 'HOST', 'value': '192.168.102.2'},
+            {'name': 'IOU', 'subType': 'HOST', 'value': '192.168.103.2'},
+            {'name': 'UbuntuServerNetwork', 'subType': 'NETWORK', 'value': '192.168.11.0/24'},
+            {'name': 'Management', 'subType': 'NETWORK', 'value': '192.168.45.0'},
+        ]
+        self.device = Device(name='FTD', os='ftd', custom=AttrDict({'network_objects': self.desired}))
+
+    def reconcile(self, inventory):
+        steps = MagicMock()
+        with patch.object(self.script, 'device', self.device):
+            self.script.create_network_objects(steps, MagicMock(client=self.client), inventory, max_workers=4)
+        return steps.start.return_value.__enter__.return_value
+
+    def test_listing_reads_every_page(self):
+        self.existing = [AttrDict(id=str(i), name=f'obj{i}') for i in range(4)]
+
+        items = fetch_all_items(self.client.NetworkObject.getNetworkObjectList, page_size=2)
+
+        self.assertEqual([item.name for item in items], ['obj0', 'obj1', 'obj2', 'obj3'])
+        # two full pages, then an empty one ends the listing
+        self.assertEqual(self.client.NetworkObject.getNetworkObjectList.call_count, 3)
+
+    def test_objects_are_reconciled(self):
+        inventory = FdmInventory(self.client)
+        step = self.reconcile(inventory)
+
+        # CSR is unchanged, IOSv changed value, Management changed subType, IOU and UbuntuServerNetwork are new
+        edited = sorted(call.kwargs['objId'] for call in self.client.NetworkObject.editNetworkObject.call_args_list)
+        self.assertEqual(edited, ['n2', 'n5'])
+        created = sorted(call.kwargs['body'].name for call in self.client.NetworkObject.addNetworkObject.call_args_list)
+        self.assertEqual(created, ['IOU', 'UbuntuServerNetwork'])
+        self.assertEqual(inventory.get('network_objects', 'IOSv').value, '192.168.102.2')
+        self.assertEqual(inventory.get('network_objects', 'Management').subType, 'NETWORK')
+        self.assertEqual(inventory.get('network_objects', 'UbuntuServerNetwork').id, 'id-UbuntuServerNetwork')
+
+        # the failed create is reported, after the others were applied
+        step.failed.assert_called_once()
+        self.assertIn('IOU (422 Unprocessable Entity)', step.failed.call_args.args[0])
+        self.assertIsNone(inventory.get('network_objects', 'IOU'))
+
+    def test_rerun_changes_nothing(self):
+        self.existing[1].value = '192.168.102.2'
+        self.existing[2].subType = 'NETWORK'
+        self.existing += [AttrDict(id='n3', name='IOU', subType='HOST', value='192.168.103.2'),
+                          AttrDict(id='n4', name='UbuntuServerNetwork', subType='NETWORK', value='192.168.11.0/24')]
+
+        step = self.reconcile(FdmInventory(self.client))
+
+        self.client.NetworkObject.addNetworkObject.assert_not_called()
+        self.client.NetworkObject.editNetworkObject.assert_not_called()
+        step.failed.assert_not_called()
+
+
+class TestFdmStaticRoutes(unittest.TestCase):
+    """
+    Tests for the static routes of configure_fdm_via_rest: existing routes are skipped or edited.
+    """
+
+    def setUp(self):
+        self.script = import_fdm_script()
+        self.client = MagicMock()
+        self.client.get_model.return_value = lambda **fields: AttrDict(fields)
+        collections = {
+            'getNetworkObjectList': [AttrDict(id=f'n-{name}', name=name, type='networkobject')
+                                     for name in ('CSR', 'IOSv', 'IOU', 'UbuntuServerNetwork')],
+            'getPhysicalInterfaceList': [AttrDict(id=f'i-{name}', name=name, hardwareName=f'GigabitEthernet0/{i}',
+                                                  type='physicalinterface')
+                                         for i, name in enumerate(('outside', 'iosv', 'iou2'))],
+            'getVirtualRouterList': [AttrDict(id='vr1', name='Global')],
+        }
+        for resource, operation in (('NetworkObject', 'getNetworkObjectList'), ('Interface', 'getPhysicalInterfaceList'),
+                                    ('Routing', 'getVirtualRouterList')):
+            getattr(getattr(self.client, resource), operation).side_effect = \
+                lambda offset, limit, items=collections[operation]: FdmResult({'items': items[offset:offset + limit]})
+        network = [AttrDict(id='n-UbuntuServerNetwork')]
+        routes = [
+            # same as desired
+            AttrDict(id='r1', iface=AttrDict(id='i-outside'), gateway=AttrDict(id='n-CSR'), networks=network),
+            # desired gateway is IOSv
+            AttrDict(id='r2', iface=AttrDict(id='i-iosv'), gateway=AttrDict(id='n-CSR'), networks=network),
+        ]
+        self.client.Routing.getStaticRouteEntryList.side_effect = lambda offset, limit, parentId: FdmResult(
+            {'items': routes[offset:offset + limit]})
+        self.client.Routing.addStaticRouteEntry.side_effect = lambda parentId, body: FdmResult(AttrDict(body, id='r3'))
+        self.client.Routing.editStaticRouteEntry.side_effect = lambda parentId, objId, body: FdmResult(body)
+
+    def test_routes_are_reconciled(self):
+        inventory = FdmInventory(self.client)
+        self.script.create_static_routes(MagicMock(), MagicMock(client=self.client), inventory)
+
+        self.client.Routing.getStaticRouteEntryList.assert_called_once_with(offset=0, limit=100, parentId='vr1')
+        self.client.Routing.editStaticRouteEntry.assert_called_once()
+        edit = self.client.Routing.editStaticRouteEntry.call_args.kwargs
+        self.assertEqual((edit['objId'], edit['body'].gateway.id), ('r2', 'n-IOSv'))
+        self.client.Routing.addStaticRouteEntry.assert_called_once()
+        body = self.client.Routing.addStaticRouteEntry.call_args.kwargs['body']
+        self.assertEqual((body.iface.id, body.gateway.id), ('i-iou2', 'n-IOU'))
+        self.assertEqual(len(inventory.items('static_routes', parentId='vr1')), 3)
+
+        # a rerun with the updated inventory changes nothing
+        self.client.Routing.addStaticRouteEntry.reset_mock()
+        self.client.Routing.editStaticRouteEntry.reset_mock()
+        self.script.create_static_routes(MagicMock(), MagicMock(client=self.client), inventory)
+        self.client.Routing.addStaticRouteEntry.assert_not_called()
+        self.client.Routing.editStaticRouteEntry.assert_not_called()
+
+
+class TestFdmDeploymentWaiter(unittest.TestCase):
+    """
+    Tests for the FDM deployment waiter: streamed messages, backoff and deadline.
+    """
+
+    @staticmethod
+    def _client(*polls):
+        client = MagicMock()
+        client.Deployment.addDeployment.return_value.result.return_value = AttrDict(id='d1')
+        client.Deployment.getDeployment.return_value.result.side_effect = [
+            {'deploymentStatusMessages': list(messages)} for messages in polls]
+        return client
+
+    def test_new_messages_are_yielded_once(self):
+        queued = {'taskState': 'QUEUED'}
+        deploying = {'taskState': 'DEPLOYING'}
+        finished = {'taskState': 'FINISHED'}
+        client = self._client([], [queued], [queued], [queued, deploying, finished])
+        delays = []
+
+        messages = list(watch_deployment(client, 'd1', initial_delay=1, jitter=0, sleep=delays.append))
+
+        self.assertEqual(messages, [queued, deploying, finished])
+        # the delay doubles while nothing changes and restarts after new messages
+        self.assertEqual(delays, [1, 1, 2])
+
+    def test_deadline_raises_timeout(self):
+        now = [0.0]
+        client = MagicMock()
+        client.Deployment.getDeployment.return_value.result.return_value = {'deploymentStatusMessages': []}
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        with self.assertRaises(TimeoutError):
+            list(watch_deployment(client, 'd1', deadline=10, jitter=0, sleep=sleep, clock=lambda: now[0]))
+        self.assertEqual(now[0], 10)
+
+    def test_deploy_all_reports_each_device(self):
+        clients = {
+            'FTD1': self._client([{'taskState': 'FINISHED'}]),
+            'FTD2': self._client([{'taskState': 'DEPLOY_FAILED'}]),
+        }
+
+        results = deploy_all(clients, sleep=lambda _: None)
+
+        self.assertEqual(results['FTD1']['status'], 'success')
+        self.assertEqual(results['FTD2']['status'], 'failed')
+        self.assertIn('DEPLOY_FAILED', results['FTD2']['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
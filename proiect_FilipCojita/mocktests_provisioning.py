@@ -0,0 +1,387 @@
+"""
+Tests using unittest library and MagicMock for provisioning and verifying the whole testbed.
+
+This suite covers:
+- Per-device ordering and results of the concurrent ProvisioningEngine
+- Management dependency waves of the device scheduler
+- Intent fingerprints that skip unchanged devices on reruns
+- Concurrent endpoint verification in UbuntuPingTester
+- Process-wide cache of parsed testbeds
+- ICMP echo probing of the loopback interface over one socket
+"""
+
+import importlib
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from ipaddress import ip_address, ip_interface
+from pyats.datastructures import AttrDict
+from pyats.topology import Device, Testbed, Interface, loader
+from pyats.topology.credentials import Credentials
+from ubuntu_setup import UbuntuNetworkConfigurator
+from provisioning_engine import ProvisioningEngine
+from dependency_scheduler import build_dependencies, topological_waves
+from intent_cache import IntentCache, device_fingerprint
+from verify_ubuntu_ping import UbuntuPingTester, extract_ips_from_testbed
+from testbed_cache import load_testbed, clear_testbed_cache
+
+
+class TestDependencyScheduler(unittest.TestCase):
+    """
+    Tests for the dependency scheduler: devices come after the hops their management path uses.
+    """
+
+    def setUp(self):
+        # ubuntu-host -- R1 -- R2 -- R3, every router routing back to the host through its upstream
+        self.tb = Testbed(name='chain')
+        links = [MagicMock() for _ in range(3)]
+        host = Device(name='ubuntu-host', os='linux', type='ubuntu', testbed=self.tb)
+        host.custom = AttrDict()
+        self._iface(host, 'ens4', '192.168.11.21', links[0])
+        for number in (1, 2, 3):
+            dev = Device(name=f'R{number}', os='ios', type='router', testbed=self.tb)
+            dev.custom = AttrDict()
+            upstream_ip = '192.168.11.1' if number == 1 else f'192.168.{10 + number}.2'
+            self._iface(dev, 'Gi0/0', upstream_ip, links[number - 1], alias='initial')
+            if number < 3:
+                self._iface(dev, 'Gi0/1', f'192.168.{11 + number}.1', links[number])
+        self.tb.devices['R2'].custom.gateway = {'dest': '192.168.11.0', 'next_hop': '192.168.12.1'}
+        self.tb.devices['R3'].custom.static_routes = [{'dest': '192.168.11.0', 'next_hop': '192.168.13.1'}]
+
+    @staticmethod
+    def _iface(dev, name, ip, link, alias=None):
+        iface = Interface(name=name, type='ethernet')
+        iface.alias = alias
+        iface.ipv4 = MagicMock()
+        iface.ipv4.ip.compressed = ip
+        iface.link = link
+        dev.interfaces[name] = iface
+
+    def test_waves_follow_next_hops(self):
+        dependencies = build_dependencies(self.tb)
+
+        self.assertEqual(dependencies['R3'], {'ubuntu-host', 'R2'})
+        self.assertEqual(topological_waves(dependencies), [['ubuntu-host'], ['R1'], ['R2'], ['R3']])
+        # devices outside the run do not hold the others back
+        self.assertEqual(topological_waves(dependencies, ['R3', 'R1']), [['R3', 'R1']])
+
+    def test_ip_helper_neighbour_never_closes_a_cycle(self):
+        self.tb.devices['R1'].interfaces['Gi0/1'].alias = 'to_r2'
+        self.tb.devices['R1'].custom.ip_helper = {'next_hop': 'to_r2', 'ip': '192.168.12.2'}
+
+        dependencies = build_dependencies(self.tb)
+
+        self.assertNotIn('R2', dependencies['R1'])
+        self.assertEqual(topological_waves({'A': {'B'}, 'B': {'A'}, 'C': set()}), [['C'], ['A', 'B']])
+
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.UbuntuNetworkConfigurator')
+    def test_engine_configures_wave_by_wave(self, mock_ubuntu, mock_ssh):
+        calls = []
+        mock_ubuntu.side_effect = lambda dev, **kwargs: MagicMock(configure=lambda: calls.append(dev.name))
+        mock_ssh.side_effect = lambda dev, **kwargs: MagicMock(configure_interfaces=lambda: calls.append(dev.name))
+        for dev in self.tb.devices.values():
+            dev.connections = AttrDict({'ssh': AttrDict()}) if dev.os == 'ios' else AttrDict()
+
+        engine = ProvisioningEngine(self.tb, max_workers=4, dependency_order=True)
+        engine.run()
+
+        self.assertEqual(calls, ['ubuntu-host', 'R1', 'R2', 'R3'])
+        self.assertEqual(len(engine.waves), 4)
+
+
+class TestProvisioningEngine(unittest.TestCase):
+    """
+    Tests for ProvisioningEngine: per-device ordering and per-device results.
+    """
+
+    def setUp(self):
+        self.tb = Testbed(name='engine-testbed')
+        for name in ('R1', 'R2'):
+            dev = Device(name=name, os='ios', testbed=self.tb)
+            dev.connections = AttrDict({'telnet': AttrDict(), 'ssh': AttrDict()})
+
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_telnet_runs_before_ssh_per_device(self, mock_telnet, mock_ssh):
+        calls = []
+        mock_telnet.side_effect = lambda dev: MagicMock(
+            do_initial_configuration=lambda: calls.append((dev.name, 'telnet')))
+        mock_ssh.side_effect = lambda dev, **kwargs: MagicMock(
+            configure_interfaces=lambda: calls.append((dev.name, 'ssh')))
+
+        engine = ProvisioningEngine(self.tb, max_workers=2, ssh_delay=0)
+        results = engine.run()
+
+        for name in ('R1', 'R2'):
+            self.assertEqual(results[name]['status'], 'success')
+            self.assertIn('telnet', results[name]['phases'])
+            self.assertIn('ssh', results[name]['phases'])
+            self.assertLess(calls.index((name, 'telnet')), calls.index((name, 'ssh')))
+
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_failure_is_recorded_per_device(self, mock_telnet, mock_ssh):
+        def make_ssh(dev, **kwargs):
+            ssh = MagicMock()
+            if dev.name == 'R2':
+                ssh.connect.side_effect = RuntimeError('unreachable')
+            return ssh
+        mock_ssh.side_effect = make_ssh
+
+        results = ProvisioningEngine(self.tb, max_workers=1, ssh_delay=0).run()
+
+        self.assertEqual(results['R1']['status'], 'success')
+        self.assertEqual(results['R2']['status'], 'failed')
+        self.assertIn('unreachable', results['R2']['errors']['ssh'])
+
+    @patch('provisioning_engine.ProvisioningEngine._port_open', return_value=True)
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_pipeline_starts_ssh_while_bootstraps_continue(self, mock_telnet, mock_ssh, mock_port):
+        r2_bootstrapped = threading.Event()
+        mock_telnet.side_effect = lambda dev: MagicMock(
+            do_initial_configuration=lambda: dev.name == 'R2' and r2_bootstrapped.set())
+
+        def make_ssh(dev, **kwargs):
+            # R1's SSH phase needs R2's bootstrap to run meanwhile on the single Telnet worker
+            return MagicMock(configure_interfaces=lambda: dev.name == 'R1' and r2_bootstrapped.wait(5))
+        mock_ssh.side_effect = make_ssh
+        for dev in self.tb.devices.values():
+            dev.connections.ssh = AttrDict({'ip': ip_address('192.0.2.1'), 'port': 22})
+
+        results = ProvisioningEngine(self.tb, max_workers=1, ssh_workers=1, pipeline=True).run(['R1', 'R2'])
+
+        self.assertTrue(r2_bootstrapped.is_set())
+        for name in ('R1', 'R2'):
+            self.assertEqual(results[name]['status'], 'success')
+            self.assertEqual(set(results[name]['phases']), {'telnet', 'ssh_wait', 'ssh'})
+
+    @patch('provisioning_engine.ProvisioningEngine._port_open', return_value=True)
+    @patch('provisioning_engine.build_dependencies', return_value={'R1': set(), 'R2': {'R1'}})
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_waves_only_order_the_ssh_phase(self, mock_telnet, mock_ssh, mock_deps, mock_port):
+        for dev in self.tb.devices.values():
+            dev.connections.ssh = AttrDict({'ip': ip_address('192.0.2.1'), 'port': 22})
+
+        for pipeline in (False, True):
+            # both consoles must be bootstrapped at the same time, although R2 is in the second wave
+            barrier = threading.Barrier(2, timeout=5)
+            configured = []
+            mock_telnet.side_effect = lambda dev, barrier=barrier: MagicMock(do_initial_configuration=barrier.wait)
+            mock_ssh.side_effect = lambda dev, configured=configured, **kwargs: MagicMock(
+                configure_interfaces=lambda: configured.append(dev.name))
+
+            engine = ProvisioningEngine(self.tb, max_workers=2, ssh_delay=0, pipeline=pipeline, dependency_order=True)
+            results = engine.run()
+
+            self.assertEqual(engine.waves, [['R1'], ['R2']])
+            self.assertEqual(configured, ['R1', 'R2'])
+            for name in ('R1', 'R2'):
+                self.assertEqual(results[name]['status'], 'success', results[name]['errors'])
+
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_pipeline_ssh_wait_does_not_hold_the_console_worker(self, mock_telnet, mock_ssh):
+        r2_bootstrapped = threading.Event()
+        mock_telnet.side_effect = lambda dev: MagicMock(
+            do_initial_configuration=lambda: dev.name == 'R2' and r2_bootstrapped.set())
+        for dev in self.tb.devices.values():
+            dev.connections.ssh = AttrDict({'ip': ip_address('192.0.2.1'), 'port': 22})
+
+        # R1 only answers on SSH once R2 was bootstrapped by the single Telnet worker
+        with patch('provisioning_engine.ProvisioningEngine._port_open', side_effect=lambda _: r2_bootstrapped.is_set()):
+            results = ProvisioningEngine(self.tb, max_workers=1, ssh_workers=2, pipeline=True,
+                                         ssh_ready_timeout=5, ssh_poll_interval=0.01).run(['R1', 'R2'])
+
+        self.assertEqual(results['R1']['status'], 'success')
+        self.assertEqual(results['R2']['status'], 'success')
+
+    @patch('provisioning_engine.ProvisioningEngine._port_open', return_value=False)
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_pipeline_skips_ssh_when_port_never_answers(self, mock_telnet, mock_ssh, mock_port):
+        for dev in self.tb.devices.values():
+            dev.connections.ssh = AttrDict({'ip': ip_address('192.0.2.1'), 'port': 22})
+
+        results = ProvisioningEngine(self.tb, pipeline=True, ssh_ready_timeout=0).run()
+
+        mock_ssh.assert_not_called()
+        self.assertEqual(results['R1']['status'], 'failed')
+        self.assertIn('did not answer', results['R1']['errors']['ssh_wait'])
+
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_rerun_only_touches_changed_or_failed_devices(self, mock_telnet, mock_ssh):
+        self.tb.devices['R3'] = Device(name='R3', os='ios', testbed=self.tb,
+                                       connections=AttrDict({'telnet': AttrDict()}))
+        mock_telnet.side_effect = lambda dev: MagicMock(do_initial_configuration=MagicMock(
+            side_effect=RuntimeError('console busy') if dev.name == 'R3' else None))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'state.json')
+            first = ProvisioningEngine(self.tb, ssh_delay=0, state_file=state_file).run()
+            self.assertEqual(first['R3']['status'], 'failed')
+
+            self.tb.devices['R2'].custom = AttrDict({'hostname': 'edited'})
+            mock_telnet.reset_mock()
+            mock_telnet.side_effect = None
+            second = ProvisioningEngine(self.tb, ssh_delay=0, state_file=state_file).run()
+
+            self.assertEqual(second['R1']['status'], 'unchanged')
+            self.assertEqual({call.args[0].name for call in mock_telnet.call_args_list}, {'R2', 'R3'})
+            self.assertEqual(second['R3']['status'], 'success')
+            self.assertTrue(IntentCache(state_file).is_current('R2', device_fingerprint(self.tb.devices['R2'])))
+
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_password_change_forces_reapply(self, mock_telnet, mock_ssh):
+        for dev in self.tb.devices.values():
+            dev.credentials = Credentials({'default': {'username': 'admin', 'password': 'secret1'}})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'state.json')
+            ProvisioningEngine(self.tb, ssh_delay=0, state_file=state_file).run()
+
+            # same length, so the masked str() of the password is unchanged
+            self.tb.devices['R2'].credentials = Credentials({'default': {'username': 'admin', 'password': 'secret2'}})
+            mock_telnet.reset_mock()
+            results = ProvisioningEngine(self.tb, ssh_delay=0, state_file=state_file).run()
+
+            self.assertEqual(results['R1']['status'], 'unchanged')
+            self.assertEqual(results['R2']['status'], 'success')
+            self.assertEqual([call.args[0].name for call in mock_telnet.call_args_list], ['R2'])
+            with open(state_file, encoding='utf-8') as file:
+                self.assertNotIn('secret', file.read())
+
+    def test_ubuntu_fingerprint_follows_testbed_routes(self):
+        ubuntu = Device(name='ubuntu-host', os='linux', type='ubuntu', testbed=self.tb, custom=AttrDict({
+            'network_config': {'interface': 'ens4', 'ip': '192.168.11.21/24', 'gateway': '192.168.11.1'}}))
+        ubuntu.interfaces = {}
+        router = self.tb.devices['R1']
+        router.interfaces = {}
+        before = device_fingerprint(ubuntu)
+
+        iface = Interface(name='Ethernet0/1', type='ethernet')
+        iface.ipv4 = ip_interface('192.168.120.1/24')
+        router.interfaces['Ethernet0/1'] = iface
+
+        self.assertNotEqual(device_fingerprint(ubuntu), before)
+
+    @patch('provisioning_engine.ProvisioningEngine._port_open', return_value=True)
+    @patch('provisioning_engine.SSHConnectorParamiko')
+    @patch('provisioning_engine.TelnetConnector2')
+    def test_entry_points_pass_on_unchanged_rerun(self, mock_telnet, mock_ssh, mock_port):
+        for dev in self.tb.devices.values():
+            dev.connections.ssh = AttrDict({'ip': ip_address('192.0.2.1'), 'port': 22})
+        with patch('testbed_cache.load_testbed', return_value=self.tb):
+            main_autofill = importlib.reload(importlib.import_module('main_autofill'))
+            main_alldev = importlib.reload(importlib.import_module('main_alldev'))
+
+        for testcase in (main_autofill.AutoFillDevicesTest.configure_devices,
+                         main_alldev.AllDevicesTelnetSSHTest.configure_all_devices):
+            with tempfile.TemporaryDirectory() as tmp, \
+                    patch.object(main_autofill, 'STATE_FILE', os.path.join(tmp, 'state.json')), \
+                    patch.object(main_alldev, 'STATE_FILE', os.path.join(tmp, 'state.json')), \
+                    patch.object(main_autofill, 'autofill_missing_data'):
+                for _ in range(2):
+                    mock_telnet.reset_mock()
+                    section = MagicMock()
+                    testcase(section)
+                    section.failed.assert_not_called()
+                # the rerun found every device unchanged
+                mock_telnet.assert_not_called()
+
+
+class TestUbuntuPingTester(unittest.TestCase):
+    """
+    Tests for UbuntuPingTester: concurrent pings, results kept in endpoint order.
+    """
+
+    @patch('verify_ubuntu_ping.subprocess.run')
+    def test_concurrent_verify_keeps_endpoint_order(self, mock_run):
+        barrier = threading.Barrier(4, timeout=5)
+
+        def fake_ping(cmd, **kwargs):
+            # every ping waits for the others, so this only passes when they run at the same time
+            barrier.wait()
+            ip = cmd[-1]
+            return MagicMock(returncode=0 if ip != '192.0.2.3' else 1, stdout=f'ping {ip}', stderr='')
+
+        mock_run.side_effect = fake_ping
+        endpoints = ['192.0.2.4', '192.0.2.1', '192.0.2.3', '192.0.2.2']
+        tester = UbuntuPingTester(endpoints, max_workers=4)
+
+        self.assertFalse(tester.verify_all())
+        self.assertEqual(list(tester.results), endpoints)
+        self.assertEqual(tester.results['192.0.2.3']['status'], 'unreachable')
+        self.assertEqual(tester.results['192.0.2.1'], {'status': 'reachable', 'stdout': 'ping 192.0.2.1', 'stderr': ''})
+
+    def test_icmp_backend_probes_loopback(self):
+        tester = UbuntuPingTester(['127.0.0.1', '127.0.0.2'], backend='icmp', count=3, timeout=1)
+        try:
+            success = tester.verify_all()
+        except PermissionError:
+            self.skipTest("ICMP sockets are not permitted for this user")
+
+        self.assertTrue(success)
+        for ip in ('127.0.0.1', '127.0.0.2'):
+            result = tester.results[ip]
+            self.assertEqual(result['status'], 'reachable')
+            self.assertEqual((result['sent'], result['received'], result['loss']), (3, 3, 0.0))
+            self.assertLessEqual(result['rtt_min'], result['rtt_max'])
+
+
+class TestTestbedCache(unittest.TestCase):
+    """
+    Tests for load_testbed: one parse per file version, shared by every helper.
+    """
+    TOPOLOGY = """
+devices:
+  R1:
+    os: ios
+    type: router
+    connections:
+      cli:
+        protocol: ssh
+        ip: 192.0.2.1
+topology:
+  R1:
+    interfaces:
+      Gi0/0:
+        type: ethernet
+        ipv4: 192.168.11.1/24
+"""
+
+    def setUp(self):
+        clear_testbed_cache()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'topo.yaml')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(self.TOPOLOGY)
+
+    def tearDown(self):
+        clear_testbed_cache()
+
+    def test_file_is_parsed_once_per_version(self):
+        with patch('testbed_cache.loader.load', wraps=loader.load) as mock_load:
+            tb = load_testbed(self.path)
+            self.assertIs(load_testbed(os.path.relpath(self.path)), tb)
+            self.assertIs(load_testbed(tb), tb)
+            self.assertEqual(extract_ips_from_testbed(self.path), ['192.168.11.1'])
+            self.assertEqual(UbuntuNetworkConfigurator.generate_routes_from_testbed(self.path, 'ubuntu'),
+                             {'route-1': '192.168.11.0/24'})
+            self.assertEqual(mock_load.call_count, 1)
+
+            stat = os.stat(self.path)
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.assertIsNot(load_testbed(self.path), tb)
+            self.assertEqual(mock_load.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
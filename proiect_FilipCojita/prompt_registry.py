@@ -0,0 +1,87 @@
+"""
+prompt_registry compiles the prompt lists waited for by the Telnet and SSH
+connectors, once per process.
+
+A prompt list is merged into one alternation regex, so a single scan of the
+received output finds the earliest prompt. Which prompt it was is read from a
+second regex with a named group per prompt, matched only at that position:
+capturing groups would stop the regex engine from skipping quickly over the
+characters no prompt can start with. The same few lists (e.g. [r'\\(config\\)#'])
+are sent thousands of times in a fleet run and are only compiled the first time.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple, Union
+
+# group name of the prompt at position i in the list
+GROUP_PREFIX = 'p'
+
+
+class PromptMatcher:
+    """
+    One compiled prompt list.
+
+    The patterns are combined as (?:...)|(?:...)|..., so they must not use numbered
+    backreferences or named groups of their own.
+
+    Attributes:
+        patterns (Tuple[str, ...]): The prompt regexes, in the order given by the caller.
+        regex (re.Pattern): Bytes regex matching any of the prompts (never matches when there are none).
+    """
+
+    def __init__(self, patterns: Tuple[str, ...]) -> None:
+        self.patterns = patterns
+        if len(patterns) == 1:
+            # a single prompt keeps the fast literal-prefix search of the engine
+            self.regex: re.Pattern = re.compile(patterns[0].encode())
+            self._named: Optional[re.Pattern] = None
+        else:
+            self.regex = re.compile(('|'.join(f'(?:{pattern})' for pattern in patterns) or '(?!)').encode())
+            self._named = re.compile('|'.join(f'(?P<{GROUP_PREFIX}{i}>{pattern})'
+                                              for i, pattern in enumerate(patterns)).encode())
+
+    def search(self, buffer: Union[bytes, bytearray], pos: int = 0) -> Optional[re.Match]:
+        """
+        Find the earliest prompt in the buffer, from position pos.
+
+        Returns:
+            Optional[re.Match]: The match (see index()), or None when no prompt is there yet.
+        """
+        return self.regex.search(buffer, pos)
+
+    def index(self, match: re.Match) -> int:
+        """
+        Position, in the prompt list, of the prompt that produced a match of self.regex.
+
+        The buffer must not have been modified since the match was found.
+        """
+        if self._named is None:
+            return 0
+        return int(self._named.match(match.string, match.start()).lastgroup[len(GROUP_PREFIX):])
+
+
+@lru_cache(maxsize=None)
+def _compile(patterns: Tuple[str, ...]) -> PromptMatcher:
+    return PromptMatcher(patterns)
+
+
+def prompt_matcher(prompts: Union[str, Iterable[str], None]) -> PromptMatcher:
+    """
+    Return the shared matcher of a prompt list, compiling it on first use.
+
+    Args:
+        prompts (Union[str, Iterable[str], None]): One prompt regex or a list of them.
+
+    Returns:
+        PromptMatcher: The matcher; equal lists share the same object.
+    """
+    if prompts is None:
+        prompts = ()
+    elif isinstance(prompts, str):
+        prompts = (prompts,)
+    return _compile(tuple(prompts))
+
+
+def clear_prompt_cache() -> None:
+    """Forget every compiled prompt list."""
+    _compile.cache_clear()
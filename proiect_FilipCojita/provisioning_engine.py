@@ -0,0 +1,340 @@
+"""
+provisioning_engine runs the configuration of every device in the testbed
+through a bounded pool of worker threads.
+
+Each device is handled by a single worker, so the ordering inside one device
+is kept (Telnet bootstrap first, SSH configuration after), while different
+devices are configured at the same time.
+
+In pipeline mode the two phases run in separate pools: a device leaves the
+Telnet pool as soon as its bootstrap is done and enters the SSH pool once its
+management address answers on the SSH port.
+
+With dependency_order, devices are configured in waves (see dependency_scheduler):
+a wave starts once the devices its management traffic is routed through are done.
+The console bootstrap does not use the management path, so it is not held back
+by the waves.
+"""
+
+import socket
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Union
+from pyats.topology import Device, Testbed
+
+from ubuntu_setup import UbuntuNetworkConfigurator
+from telnet_connector2 import TelnetConnector2
+from ssh_connector_paramiko import SSHConnectorParamiko
+from dependency_scheduler import build_dependencies, topological_waves
+from intent_cache import IntentCache, device_fingerprint
+from config_renderer import ConfigRenderer
+
+
+class ProvisioningEngine:
+    """
+    Configures the devices of a pyATS testbed concurrently.
+
+    Attributes:
+        testbed (Testbed): The loaded (and autofilled) testbed.
+        max_workers (int): Maximum number of devices configured at the same time.
+        ssh_delay (float): Seconds to wait between the Telnet and the SSH phase of a device.
+        results (dict): Per-device results, e.g.
+            {'CSR': {'status': 'success', 'phases': {'telnet': 41.2, 'ssh': 12.9}, 'errors': {}}}
+        phase_times (dict): Total time spent in each phase, summed over all devices.
+        elapsed (float): Wall-clock time of the last run, in seconds.
+        waves (list): Device names of each wave of the last run, e.g. [['ubuntu-host'], ['IOU1', 'FTD']].
+    """
+
+    PHASES = ('ubuntu', 'telnet', 'ssh_wait', 'ssh')
+
+    def __init__(self, testbed: Testbed, max_workers: int = 8, **kwargs) -> None:
+        """
+        Args:
+            testbed (Testbed): pyATS testbed holding the devices to configure.
+            max_workers (int): Concurrency cap for the worker pool.
+            **kwargs: Optional parameters like ssh_delay, testbed_path (path or loaded testbed
+                used for Ubuntu route discovery), ssh_options
+                (keyword arguments forwarded to SSHConnectorParamiko), ubuntu_options
+                (forwarded to UbuntuNetworkConfigurator), pipeline (run the Telnet and SSH
+                phases in separate pools), ssh_workers (size of the SSH pool, max_workers by
+                default), ssh_ready_timeout (seconds to wait for the SSH port after Telnet),
+                dependency_order (configure the devices in dependency waves) and state_file
+                (skip the devices whose intent is unchanged since their last successful apply).
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+
+        self.testbed: Testbed = testbed
+        self.max_workers: int = max_workers
+        self.ssh_delay: float = kwargs.get('ssh_delay', 3)
+        self.testbed_path: Optional[Union[str, Testbed]] = kwargs.get('testbed_path')
+        self.ssh_options: Dict[str, Any] = kwargs.get('ssh_options', {})
+        self.ubuntu_options: Dict[str, Any] = kwargs.get('ubuntu_options', {})
+        self.pipeline: bool = kwargs.get('pipeline', False)
+        self.ssh_workers: int = kwargs.get('ssh_workers', max_workers)
+        self.ssh_ready_timeout: float = kwargs.get('ssh_ready_timeout', 120)
+        self.ssh_poll_interval: float = kwargs.get('ssh_poll_interval', 1)
+        self.dependency_order: bool = kwargs.get('dependency_order', False)
+        self.waves: List[List[str]] = []
+        state_file: Optional[str] = kwargs.get('state_file')
+        self.intent_cache: Optional[IntentCache] = IntentCache(state_file) if state_file else None
+        self.renderer: ConfigRenderer = ConfigRenderer()
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.phase_times: Dict[str, float] = {}
+        self.elapsed: float = 0.0
+        self._lock = threading.Lock()
+
+    def run(self, device_names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Configure the given devices (all testbed devices by default) and print a timing report.
+
+        Args:
+            device_names (Optional[Iterable[str]]): Names of the devices to configure.
+
+        Returns:
+            dict: The per-device results.
+        """
+        names = list(device_names) if device_names is not None else list(self.testbed.devices)
+        self.results = {}
+        self.phase_times = {phase: 0.0 for phase in self.PHASES}
+        # render every device once per run, shared by the fingerprints and the SSH connectors
+        self.renderer = ConfigRenderer()
+
+        fingerprints: Dict[str, str] = {}
+        if self.intent_cache is not None:
+            fingerprints = {name: device_fingerprint(self.testbed.devices[name], self.renderer) for name in names}
+            unchanged = [name for name in names if self.intent_cache.is_current(name, fingerprints[name])]
+            for name in unchanged:
+                self.results[name] = {'status': 'unchanged', 'phases': {}, 'errors': {}}
+            names = [name for name in names if name not in self.results]
+
+        if self.dependency_order:
+            self.waves = topological_waves(build_dependencies(self.testbed), names)
+        else:
+            self.waves = [names]
+
+        start_time = time.perf_counter()
+        if self.pipeline:
+            self._run_pipeline(self.waves)
+        elif len(self.waves) > 1:
+            self._run_waves(self.waves)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='provision') as pool:
+                futures = {pool.submit(self.provision_device, self.testbed.devices[name]): name for name in names}
+                self._collect(futures)
+        self.elapsed = time.perf_counter() - start_time
+
+        if self.intent_cache is not None:
+            for name in names:
+                result = self.results.setdefault(name, {'status': 'success', 'phases': {}, 'errors': {}})
+                self.intent_cache.record(name, fingerprints[name], result)
+            self.intent_cache.save()
+
+        self.report()
+        return self.results
+
+    def provision_device(self, dev: Device) -> Dict[str, Any]:
+        """
+        Run every phase needed by one device, in order.
+
+        Args:
+            dev (Device): The device to configure.
+
+        Returns:
+            dict: The result entry of the device.
+        """
+        self._bootstrap(dev)
+        if 'telnet' in dev.connections and self._needs_ssh(dev) and self.ssh_delay:
+            time.sleep(self.ssh_delay)
+        self._configure(dev)
+
+        with self._lock:
+            return self.results.setdefault(dev.name, {'status': 'success', 'phases': {}, 'errors': {}})
+
+    def _bootstrap(self, dev: Device) -> None:
+        """Console (Telnet) bootstrap of a device; it does not depend on the management path."""
+        print(f"\n[START] Configuring device: {dev.name}")
+        if not self._is_ubuntu(dev) and 'telnet' in dev.connections:
+            self._run_phase(dev, 'telnet', self._configure_telnet)
+
+    def _configure(self, dev: Device, wait_for_ssh: bool = False) -> None:
+        """Phases reached over the management network: the Ubuntu host, or SSH (skipping FTD)."""
+        if self._is_ubuntu(dev):
+            self._run_phase(dev, 'ubuntu', self._configure_ubuntu)
+            return
+        if not self._needs_ssh(dev):
+            return
+        if wait_for_ssh and 'telnet' in dev.connections and not self._run_phase(dev, 'ssh_wait', self._wait_for_ssh):
+            return
+        self._run_phase(dev, 'ssh', self._configure_ssh)
+
+    @staticmethod
+    def _is_ubuntu(dev: Device) -> bool:
+        return dev.os == 'linux' and dev.type == 'ubuntu'
+
+    @staticmethod
+    def _needs_ssh(dev: Device) -> bool:
+        return 'ssh' in dev.connections and dev.os != 'ftd'
+
+    def _announce_wave(self, number: int) -> None:
+        if len(self.waves) > 1:
+            print(f"\n[WAVE {number}/{len(self.waves)}] {', '.join(self.waves[number - 1])}")
+
+    def _run_waves(self, waves: List[List[str]]) -> None:
+        """
+        Bootstrap every device at once, then configure the waves one after the other.
+        """
+        names = [name for wave in waves for name in wave]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bootstrap') as pool:
+            self._collect({pool.submit(self._bootstrap, self.testbed.devices[name]): name for name in names})
+        if self.ssh_delay and any('telnet' in self.testbed.devices[name].connections for name in names):
+            time.sleep(self.ssh_delay)
+
+        for number, wave in enumerate(waves, start=1):
+            self._announce_wave(number)
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='provision') as pool:
+                self._collect({pool.submit(self._configure, self.testbed.devices[name]): name for name in wave})
+
+    def _run_pipeline(self, waves: List[List[str]]) -> None:
+        """
+        Bootstrap every device in the Telnet pool and hand each one to the SSH pool
+        right after, where it waits for its SSH port to answer before being configured.
+
+        Only the SSH pool follows the waves: a device of a wave is configured once it is
+        bootstrapped and every device of the previous waves is configured, while the
+        Telnet pool keeps bootstrapping the devices of the next waves.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bootstrap') as telnet_pool, \
+                ThreadPoolExecutor(max_workers=self.ssh_workers, thread_name_prefix='ssh') as ssh_pool:
+            bootstraps = {name: telnet_pool.submit(self._bootstrap, self.testbed.devices[name])
+                          for wave in waves for name in wave}
+
+            for number, wave in enumerate(waves, start=1):
+                self._announce_wave(number)
+                bootstrapped = {bootstraps[name]: name for name in wave}
+                ssh_futures: Dict[Any, str] = {}
+                for future in as_completed(bootstrapped):
+                    name = bootstrapped[future]
+                    self._collect({future: name})
+                    # the Telnet worker is already released, a slow boot only holds an SSH worker
+                    ssh_futures[ssh_pool.submit(self._configure, self.testbed.devices[name], True)] = name
+                self._collect(ssh_futures)
+
+    def _collect(self, futures: Dict[Any, str]) -> None:
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                # phase errors are already recorded by _run_phase, this only catches bugs
+                self._record(futures[future], 'engine', 0.0, e)
+
+    def _wait_for_ssh(self, dev: Device) -> None:
+        """
+        Wait until the SSH port of the device accepts TCP connections.
+
+        Raises:
+            TimeoutError: If it does not within ssh_ready_timeout seconds.
+        """
+        connection = dev.connections.ssh
+        address = (str(connection.ip), connection.get('port') or 22)
+        deadline = time.monotonic() + self.ssh_ready_timeout
+        while True:
+            if self._port_open(address):
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"SSH port {address[0]}:{address[1]} did not answer "
+                                   f"within {self.ssh_ready_timeout} seconds.")
+            time.sleep(self.ssh_poll_interval)
+
+    @staticmethod
+    def _port_open(address) -> bool:
+        try:
+            with socket.create_connection(address, timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def report(self) -> None:
+        """Print the per-device results and the per-phase and total timings."""
+        print("\n[REPORT] Provisioning results:")
+        for name, result in self.results.items():
+            phases = ', '.join(f"{phase}={seconds:.2f}s" for phase, seconds in result['phases'].items())
+            print(f" - {name}: {result['status']} ({phases})")
+            for phase, error in result['errors'].items():
+                print(f"     [{phase}] {error}")
+
+        for phase, seconds in self.phase_times.items():
+            if seconds:
+                print(f" Total {phase} time (all devices): {seconds:.2f} seconds")
+        print(f"\n Total configuration time: {self.elapsed:.2f} seconds")
+
+    def _run_phase(self, dev: Device, phase: str, action) -> bool:
+        """
+        Time one phase of a device and record its outcome.
+
+        Returns:
+            bool: True if the phase finished without errors.
+        """
+        start_time = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            action(dev)
+        except Exception as e:
+            error = e
+        self._record(dev.name, phase, time.perf_counter() - start_time, error)
+        return error is None
+
+    def _record(self, name: str, phase: str, seconds: float, error: Optional[Exception]) -> None:
+        with self._lock:
+            result = self.results.setdefault(name, {'status': 'success', 'phases': {}, 'errors': {}})
+            result['phases'][phase] = seconds
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+            if error is not None:
+                result['status'] = 'failed'
+                result['errors'][phase] = str(error)
+
+    def _configure_ubuntu(self, dev: Device) -> None:
+        print(f"[Ubuntu] Running local configuration for {dev.name}")
+        try:
+            ubuntu = UbuntuNetworkConfigurator(dev, testbed_path=self.testbed_path, **self.ubuntu_options)
+            ubuntu.configure()
+        except Exception as e:
+            print(f"[Ubuntu] Error configuring {dev.name}: {e}")
+            raise
+
+    def _configure_telnet(self, dev: Device) -> None:
+        print(f"[Telnet] Connecting to {dev.name}")
+        telnet_connector = TelnetConnector2(dev)
+        try:
+            telnet_connector.connect(connection=dev.connections.telnet)
+            telnet_connector.do_initial_configuration()
+            print(f"[Telnet] Configuration complete for {dev.name}")
+        except Exception as e:
+            print(f"[Telnet] Error configuring {dev.name}: {e}")
+            raise
+        finally:
+            try:
+                telnet_connector.disconnect()
+            except Exception:
+                pass
+            print(f"[Telnet] Disconnected from {dev.name}")
+
+    def _configure_ssh(self, dev: Device) -> None:
+        print(f"[SSH] Connecting to {dev.name}")
+        ssh = SSHConnectorParamiko(dev, **{'renderer': self.renderer, **self.ssh_options})
+        try:
+            ssh.connect()
+            ssh.configure_interfaces()
+            ssh.configure_routing()
+            ssh.configure_dhcp()
+            print(f"[SSH] Configuration complete for {dev.name}")
+        except Exception as e:
+            print(f"[SSH] Error configuring {dev.name}: {e}")
+            raise
+        finally:
+            try:
+                ssh.disconnect()
+            except Exception:
+                pass
+            print(f"[SSH] Disconnected from {dev.name}")
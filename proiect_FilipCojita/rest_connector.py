@@ -1,24 +1,88 @@
+import os
 import re
-from typing import Optional
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 import urllib3
 
 
 from pyats.datastructures import AttrDict
 from pyats.topology import Device
 
+# 'container <name> {' statements of a YANG module, matched within one line
+CONTAINER_PATTERN = re.compile(r'container[^\S\n](\w+) \{')
+
+
+class SchemaCache:
+    """
+    On-disk cache of YANG schemas keyed by (module, revision), shared by every device and run.
+
+    Schemas are stored as '<module>@<revision>.yang' (the YANG file naming convention), so a
+    fleet running the same image downloads each module revision only once.
+    """
+
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'yang_schemas')
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.environ.get('YANG_SCHEMA_CACHE', self.DEFAULT_ROOT)
+        self._memory: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def path(self, module: str, revision: str) -> str:
+        return os.path.join(self.root, f'{module}@{revision}.yang')
+
+    def get(self, module: str, revision: str) -> Optional[str]:
+        key = (module, revision)
+        if key in self._memory:
+            return self._memory[key]
+        try:
+            with open(self.path(module, revision)) as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._memory[key] = text
+        return text
+
+    def put(self, module: str, revision: str, text: str):
+        os.makedirs(self.root, exist_ok=True)
+        # write to a temporary file first, so concurrent runs never read a partial schema
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+        os.replace(tmp_path, self.path(module, revision))
+        with self._lock:
+            self._memory[(module, revision)] = text
+
 
 class RESTConnector:
 
     def __init__(self, device: Device, **kwargs):
-        self._session = None
+        """
+        Args:
+            device (Device): pyATS device object to connect to.
+            **kwargs: Optional parameters like pool_size (keep-alive connections kept per host),
+                retries (retries on connection errors and 429/5xx responses), backoff_factor
+                and schema_cache (SchemaCache instance, None disables caching).
+        """
+        self._session: Optional[requests.Session] = None
+        self.pool_size: int = kwargs.get('pool_size', 10)
+        self.retries: int = kwargs.get('retries', 3)
+        self.backoff_factor: float = kwargs.get('backoff_factor', 0.5)
+        self.schema_cache: Optional[SchemaCache] = kwargs.get('schema_cache', SchemaCache())
+        self.modules: dict[str, tuple[str, str]] = {}
+        self.failed_schemas: dict[str, str] = {}
         self._auth = None
         self._headers = None
         self._url = None
         self.device = device
         self.connection: Optional[AttrDict] = None
-        self.api_endpoints: list[str] = None
+        self.api_endpoints: Optional[dict[str, None]] = None
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
     def connect(self, **kwargs):
@@ -30,16 +94,35 @@ class RESTConnector:
         }
         self._url = f'https://{self.connection.ip.compressed}:{self.connection.port}'
 
+        # one keep-alive session for every request, so the TLS handshake is paid once per connection
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount('https://', adapter)
+        self._session.auth = self._auth
+        self._session.headers.update(self._headers)
+        self._session.verify = False
+
+    def _get(self, url: str) -> requests.Response:
+        if self._session is None:
+            raise RuntimeError("REST session is not established. Call connect() first.")
+        return self._session.get(url)
+
     def get_interface(self, interface_name: str) -> Optional[AttrDict]:
         endpoint = f'/restconf/data/ietf-interfaces:interfaces/interface={interface_name}'
         url = self._url + endpoint
-        response = requests.get(url, auth=self._auth, headers=self._headers, verify=False)
+        response = self._get(url)
         return response.json()
 
     def get_netconf_capabilities(self):
         netconf = f'/restconf/data/netconf-state/capabilities'
         url = self._url + netconf
-        response = requests.get(url, auth=self._auth, headers=self._headers, verify=False)
+        response = self._get(url)
         self.netconf_capabilities = response.json().get(
             'ietf-netconf-monitoring:capabilities', {}
         ).get('capability', [])
@@ -47,36 +130,106 @@ class RESTConnector:
     def get_restconf_capabilities(self):
         restconf = f'/restconf/data/ietf-yang-library:modules-state'
         url = self._url + restconf
-        response = requests.get(url, auth=self._auth, headers=self._headers, verify=False)
+        response = self._get(url)
         self.resconf_capabilities = self.__extract_endpoints(response.json())
 
     def get_api_endpoint(self, url):
-        response = requests.get(url, auth=self._auth, headers=self._headers, verify=False)
-        with open(f"{url.split('/')[-2]}.yang", 'w') as file:
-            file.write(response.text)
-        text = response.text
-        pattern = r'container\s(\w+) \{'
-        for line in text.splitlines():
-            match = re.search(pattern, line)
-            if match:
-                name = match.group(1)
+        text = self._cached_schema(url)
+        if text is None:
+            text = self._download_schema(url)
+        self._add_endpoints(url, CONTAINER_PATTERN.findall(text))
+
+    def fetch_schemas(self, urls: Optional[Iterable[str]] = None, max_workers: Optional[int] = None) -> dict[str, list[str]]:
+        """
+        Download many YANG schemas concurrently and add their containers to api_endpoints.
+
+        Schemas already in the schema cache are not downloaded again. Downloads run in a bounded
+        thread pool sharing the pooled session; parsing and the api_endpoints updates happen in
+        the calling thread as each download completes. Any other error than a failed request
+        cancels the downloads not started yet and is raised.
+
+        Args:
+            urls (Optional[Iterable[str]]): Schema URLs, all known schema endpoints by default.
+            max_workers (Optional[int]): Concurrent downloads, the session pool size by default.
+
+        Returns:
+            dict: Container names found in each schema, keyed by schema URL. Schemas whose download
+                failed are left out (and not cached); their errors are kept in failed_schemas.
+        """
+        self.failed_schemas = {}
+        urls = [url for url in (urls if urls is not None else list(self.api_endpoints)) if url]
+        found = {}
+        missing = []
+        for url in urls:
+            text = self._cached_schema(url)
+            if text is None:
+                missing.append(url)
+            else:
+                found[url] = CONTAINER_PATTERN.findall(text)
+                self._add_endpoints(url, found[url])
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as pool:
+                futures = {pool.submit(self._download_schema, url): url for url in missing}
                 try:
-                    self.api_endpoints.remove(url)
-                except ValueError:
-                    pass
-                self.api_endpoints.append(f'{url.rsplit('/', 1)[0]}:{name}')
-                print(self.api_endpoints[-1])
+                    for future in as_completed(futures):
+                        url = futures[future]
+                        try:
+                            text = future.result()
+                        except requests.RequestException as e:
+                            # one unreadable module does not stop the others; it is retried on the next fetch
+                            self.failed_schemas[url] = str(e)
+                            print(f"[WARN] Schema {url} not downloaded: {e}")
+                            continue
+                        found[url] = CONTAINER_PATTERN.findall(text)
+                        self._add_endpoints(url, found[url])
+                except BaseException:
+                    # do not keep downloading for a sweep that is already lost
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+        return found
+
+    def _module_key(self, url: str) -> tuple[str, str]:
+        # schema URLs end with /<module>/<revision> when the module is not in modules-state
+        return self.modules.get(url) or tuple(url.rstrip('/').split('/')[-2:])
+
+    def _cached_schema(self, url: str) -> Optional[str]:
+        if self.schema_cache is None:
+            return None
+        return self.schema_cache.get(*self._module_key(url))
+
+    def _download_schema(self, url: str) -> str:
+        response = self._get(url)
+        # never cache an error page as the schema of the module
+        response.raise_for_status()
+        text = response.text
+        if self.schema_cache is not None:
+            self.schema_cache.put(*self._module_key(url), text)
+        return text
+
+    def _add_endpoints(self, url: str, containers: list[str]):
+        # api_endpoints is an insertion ordered dict used as a set: O(1) removal and lookup
+        for name in containers:
+            self.api_endpoints.pop(url, None)
+            endpoint = f"{url.rsplit('/', 1)[0]}:{name}"
+            self.api_endpoints[endpoint] = None
+            print(endpoint)
 
     def __extract_endpoints(self, response):
-        self.api_endpoints = []
+        self.api_endpoints = {}
         for key, value in response.get('ietf-yang-library:modules-state', []).items():
             if key != 'module':
                 continue
             for endpoint in value:
-                self.api_endpoints.append(endpoint.get('schema'))
+                self.api_endpoints[endpoint.get('schema')] = None
+                if endpoint.get('schema'):
+                    self.modules[endpoint['schema']] = (endpoint.get('name'), endpoint.get('revision', ''))
 
     def disconnect(self):
-        pass
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     def execute(self, command, **kwargs):
         pass
@@ -85,4 +238,4 @@ class RESTConnector:
         pass
 
     def is_connected(self):
-        pass
+        return self._session is not None
@@ -0,0 +1,154 @@
+"""
+running_config parses the output of 'show running-config' of IOS devices and
+computes which rendered configuration lines the device does not have yet.
+"""
+from typing import Dict, Optional, Set, Tuple
+
+from config_renderer import ConfigCommands
+
+# commands that open a sub-mode; their indented lines belong to them
+SECTION_PREFIXES = ('interface ', 'router ', 'ip dhcp pool ')
+# commands that only move between modes and are never compared
+MODE_COMMANDS = ('configure terminal', 'exit', 'end')
+
+
+class RunningConfig:
+    """
+    Structured view of a running configuration.
+
+    Every line is stored under its section: the command that opened its sub-mode
+    (e.g. 'interface GigabitEthernet0/1', 'router ospf 1', 'ip dhcp pool POOL_A'),
+    or '' for global lines such as 'ip route ...'.
+
+    Attributes:
+        sections (dict): Lines of each section, e.g. {'interface Ethernet0/1': {'ip address 10.0.0.1 255.255.255.0'}}.
+    """
+
+    def __init__(self, sections: Optional[Dict[str, Set[str]]] = None) -> None:
+        self.sections: Dict[str, Set[str]] = sections if sections is not None else {'': set()}
+        self.sections.setdefault('', set())
+
+    @classmethod
+    def parse(cls, text: str) -> 'RunningConfig':
+        """
+        Parse the output of 'show running-config'.
+
+        Args:
+            text (str): Raw command output (echo and prompt lines are ignored).
+
+        Returns:
+            RunningConfig: The parsed configuration.
+        """
+        sections: Dict[str, Set[str]] = {'': set()}
+        current = ''
+        for raw_line in text.splitlines():
+            line = raw_line.rstrip()
+            if not line.strip() or line.strip() == '!':
+                if not line.startswith(' '):
+                    current = ''
+                continue
+            if line.startswith(' '):
+                sections.setdefault(current, set()).add(line.strip())
+            elif line.startswith(SECTION_PREFIXES):
+                current = line
+                sections.setdefault(current, set())
+            else:
+                current = ''
+                sections[''].add(line)
+        return cls(sections)
+
+    @property
+    def interfaces(self) -> Dict[str, Set[str]]:
+        """Lines of each interface, keyed by interface name."""
+        return {name[len('interface '):]: lines for name, lines in self.sections.items()
+                if name.startswith('interface ')}
+
+    @property
+    def routes(self) -> Set[str]:
+        """Static route lines ('ip route ...')."""
+        return {line for line in self.sections[''] if line.startswith('ip route ')}
+
+    @property
+    def ospf_networks(self) -> Dict[str, Set[str]]:
+        """'network ... area ...' lines of each OSPF process, keyed by process id."""
+        return {name.split()[2]: {line for line in lines if line.startswith('network ')}
+                for name, lines in self.sections.items() if name.startswith('router ospf ')}
+
+    @property
+    def dhcp_pools(self) -> Dict[str, Set[str]]:
+        """Lines of each DHCP pool, keyed by pool name."""
+        return {name[len('ip dhcp pool '):]: lines for name, lines in self.sections.items()
+                if name.startswith('ip dhcp pool ')}
+
+    def has(self, section: str, line: str) -> bool:
+        """
+        True if the line is already configured in the section.
+
+        'no shutdown' is never printed by IOS: it holds when the section has no 'shutdown' line.
+        """
+        if section and section not in self.sections:
+            return False
+        lines = self.sections.get(section, set())
+        if line == 'no shutdown':
+            return 'shutdown' not in lines
+        return line in lines
+
+    def apply(self, section: str, line: str) -> None:
+        """Record a line pushed to the device, so the model stays current."""
+        lines = self.sections.setdefault(section, set())
+        if line == 'no shutdown':
+            lines.discard('shutdown')
+        else:
+            lines.add(line)
+
+    def missing(self, commands: ConfigCommands) -> ConfigCommands:
+        """
+        Keep only the rendered lines the device does not have, with the mode commands they need.
+
+        A sub-mode command (e.g. 'interface X') and its 'exit' are kept only when one of the
+        lines inside it is missing; 'configure terminal' and 'end' only when anything is.
+
+        Args:
+            commands (ConfigCommands): Rendered (command, prompt) pairs, e.g. from interface_commands.
+
+        Returns:
+            ConfigCommands: The delta to push (empty when the device already has everything).
+        """
+        delta: ConfigCommands = []
+        section = ''
+        opener: Optional[Tuple[str, str]] = None
+        opened = False
+        for command, prompt in commands:
+            if command in MODE_COMMANDS:
+                if command == 'exit' and section:
+                    if opened:
+                        delta.append((command, prompt))
+                    section, opener, opened = '', None, False
+                continue
+            if command.startswith(SECTION_PREFIXES):
+                section, opener, opened = command, (command, prompt), False
+                continue
+            if not self.has(section, command):
+                if opener and not opened:
+                    delta.append(opener)
+                    opened = True
+                delta.append((command, prompt))
+
+        if not delta:
+            return []
+        if opened:
+            delta.append(('exit', r'\(config\)#'))
+        return [('configure terminal', r'\(config\)#')] + delta + [('end', r'#')]
+
+    def record(self, commands: ConfigCommands) -> None:
+        """Apply every line of pushed commands to the model."""
+        section = ''
+        for command, _ in commands:
+            if command in MODE_COMMANDS:
+                if command == 'exit':
+                    section = ''
+            elif command.startswith(SECTION_PREFIXES):
+                section = command
+                self.sections.setdefault(section, set())
+            else:
+                self.apply(section, command)
@@ -6,13 +6,17 @@ to be done via ssh
 
 import re
 import time
+import selectors
 import logging
 from time import sleep
-from typing import Optional, List, Union
+from typing import Optional, List, Tuple, Union
 import paramiko
 from pyats.datastructures import AttrDict
 from pyats.topology import Device
-import ipaddress
+
+from config_renderer import ConfigCommands, ConfigRenderer, device_prompt
+from prompt_registry import prompt_matcher
+from running_config import RunningConfig
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +30,19 @@ if not logger.handlers:
     handler.setFormatter(logging.Formatter('> %(message)s'))  # Simple arrow prefix
     logger.addHandler(handler)
 
+# markers printed by IOS when a configuration line is rejected
+CONFIG_ERROR_MARKERS = ('% Invalid input', '% Incomplete command', '% Ambiguous command', '% Unknown command')
+
+# seconds to wait for the whole output of 'show running-config'
+SHOW_RUN_TIMEOUT = 30
+
+
 class SSHConnectorParamiko:
     DEFAULT_PROMPT: str = r'[>#]'
+    # bytes of already scanned output that are scanned again, for prompts split between chunks
+    SCAN_WINDOW: int = 256
+    # fallback poll interval, used only when the shell cannot be registered in a selector
+    POLL_INTERVAL: float = 0.05
 
     def __init__(self, device: Device, **kwargs) -> None:
         """
@@ -35,14 +50,25 @@ class SSHConnectorParamiko:
 
         Args:
             device (Device): pyATS device object to connect to.
-            **kwargs: Optional parameters like timeout and buffer_size.
+            **kwargs: Optional parameters like timeout, buffer_size, batch (stream whole
+                config blocks instead of waiting for the prompt of every line) and chunk_size
+                (lines sent at once in batch mode) and diff (read the running configuration
+                once and push only the lines the device does not have yet) and renderer
+                (ConfigRenderer shared by the run, so every device is rendered once).
         """
         self.device: Device = device
         self.client: Optional[paramiko.SSHClient] = None
         self.shell: Optional[paramiko.Channel] = None
+        self._selector: Optional[selectors.BaseSelector] = None
         self._connected: bool = False
         self.timeout: int = kwargs.get('timeout', 10)  # seconds for read/wait
         self._buffer_size: int = kwargs.get('buffer_size', 4096)
+        self.batch: bool = kwargs.get('batch', False)
+        self.chunk_size: int = kwargs.get('chunk_size', 64)
+        self.diff: bool = kwargs.get('diff', False)
+        self.renderer: ConfigRenderer = kwargs.get('renderer') or ConfigRenderer()
+        self.running_config: Optional[RunningConfig] = None
+        self.changed: bool = False
 
     def connect(self, **kwargs) -> None:
         """
@@ -76,6 +102,8 @@ class SSHConnectorParamiko:
             )
             self.shell = self.client.invoke_shell()
             self.shell.settimeout(2)
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self.shell, selectors.EVENT_READ)
             self._connected = True
             self._clear_buffer()
         except Exception as e:
@@ -101,23 +129,47 @@ class SSHConnectorParamiko:
         return transport is not None and transport.is_active()
 
     def disconnect(self) -> None:
-        """Close the SSH shell and client connections."""
-        self.execute('write', prompt=r'#')
-        sleep(3)
+        """
+        Save the configuration and close the SSH shell and client connections.
+        In diff mode the save is skipped when nothing was pushed.
+        """
+        if not self.diff or self.changed:
+            self.execute('write', prompt=r'#')
+            sleep(3)
 
+        if self._selector:
+            self._selector.close()
+            self._selector = None
         if self.shell:
             self.shell.close()
         if self.client:
             self.client.close()
         self._connected = False
 
-    def _read_until_prompt(self, prompt_patterns: Union[str, List[str]], timeout: Optional[int] = None) -> str:
+    def _wait_for_data(self, timeout: float) -> None:
+        """
+        Block until the shell has data to read or the timeout expires.
+
+        Uses the selector registered in connect() so the read loop wakes up as soon as
+        data arrives. Channels that cannot be selected on fall back to a short poll.
+        """
+        if self._selector is not None:
+            self._selector.select(timeout)
+        else:
+            time.sleep(min(timeout, self.POLL_INTERVAL))
+
+    def _read_until_prompt(self, prompt_patterns: Union[str, List[str]], timeout: Optional[int] = None,
+                           count: int = 1) -> str:
         """
-        Read from shell until a prompt pattern is matched or timeout occurs.
+        Read from shell until a prompt pattern is matched (count times) or timeout occurs.
+
+        Only the newly received data (plus a small window of older data, for prompts that
+        are split between two chunks) is scanned after each read.
 
         Args:
             prompt_patterns (Union[str, List[str]]): Prompt regex or list of regex strings.
             timeout (Optional[int]): Timeout in seconds.
+            count (int): Number of prompts to wait for, one per command sent.
 
         Returns:
             str: The output read from the shell.
@@ -126,29 +178,39 @@ class SSHConnectorParamiko:
             TimeoutError: If prompt is not detected within timeout.
             RuntimeError: On read errors.
         """
-        if isinstance(prompt_patterns, str):
-            prompt_patterns = [prompt_patterns]
-
-        prompt_regexes = [re.compile(p.encode()) for p in prompt_patterns]
-        buffer = b''
+        matcher = prompt_matcher(prompt_patterns)
+        buffer = bytearray()
+        matched = 0
+        matched_end = 0
         timeout = timeout or self.timeout
-        end_time = time.time() + timeout
+        end_time = time.monotonic() + timeout
 
-        while time.time() < end_time:
+        while True:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                break
             try:
                 if self.shell and self.shell.recv_ready():
                     chunk = self.shell.recv(self._buffer_size)
+                    scan_from = max(matched_end, len(buffer) - self.SCAN_WINDOW)
                     buffer += chunk
 
-                    for regex in prompt_regexes:
-                        if regex.search(buffer):
+                    while True:
+                        match = matcher.search(buffer, scan_from)
+                        if match is None:
+                            break
+                        matched += 1
+                        if matched >= count:
                             return buffer.decode(errors='ignore')
+                        matched_end = scan_from = match.end()
+                elif self._selector is not None and self.shell.closed:
+                    raise EOFError("Channel closed by remote device.")
                 else:
-                    time.sleep(0.2)
+                    self._wait_for_data(remaining)
             except Exception as e:
                 raise RuntimeError(f"Error reading from shell: {e}")
 
-        raise TimeoutError(f"Timeout waiting for prompt(s) {prompt_patterns}. Output so far:\n{buffer.decode(errors='ignore')}")
+        raise TimeoutError(f"Timeout waiting for prompt(s) {list(matcher.patterns)}. Output so far:\n{buffer.decode(errors='ignore')}")
 
     def execute(self, command: str, prompt: Optional[Union[str, List[str]]] = None, timeout: Optional[int] = None) -> str:
         """
@@ -181,28 +243,110 @@ class SSHConnectorParamiko:
         except Exception as e:
             raise RuntimeError(f"Error executing command '{command}': {e}")
 
-    def configure_routing(self) -> None:
-        self.execute('configure terminal', prompt=r'\(config\)#')
-
-        if hasattr(self.device.custom, 'static_routes') and self.device.custom.static_routes:
-            for route in self.device.custom.static_routes:
-                dest = route['dest']
-                mask = route['mask']
-                next_hop = route['next_hop']
-                self.execute(f"ip route {dest} {mask} {next_hop}", prompt=r'\(config\)#')
-            self.execute('end', prompt=r'#')
+    def send_config_batch(self, commands: ConfigCommands, timeout: Optional[int] = None) -> str:
+        """
+        Stream a whole block of configuration lines without waiting for each prompt.
+
+        Lines are sent in chunks of `chunk_size`; after each chunk the method waits until the
+        device printed one prompt per line sent. The echoed output is then checked for the
+        IOS error markers.
+
+        Args:
+            commands (ConfigCommands): (command, prompt) pairs, usually from one of the render helpers.
+            timeout (Optional[int]): Timeout in seconds for each chunk.
+
+        Returns:
+            str: The echoed output of the whole block.
+
+        Raises:
+            RuntimeError: If not connected, on timeout, or if any line was rejected by the device.
+        """
+        if not self._connected or not self.shell:
+            raise RuntimeError("SSH connection is not established. Call connect() first.")
+
+        lines = [command for command, _ in commands]
+        chunk_size = self.chunk_size if self.chunk_size > 0 else len(lines) or 1
+        output = []
+        for start in range(0, len(lines), chunk_size):
+            chunk = lines[start:start + chunk_size]
+            for line in chunk:
+                logger.info(line)
+            try:
+                self.shell.sendall(''.join(f"{line}\n" for line in chunk).encode())
+                output.append(self._read_until_prompt(device_prompt(self.device), timeout, count=len(chunk)))
+            except TimeoutError as e:
+                raise RuntimeError(f"Timeout pushing configuration batch: {e}")
+
+        output = ''.join(output)
+        errors = self.find_config_errors(output)
+        if errors:
+            details = '\n'.join(f" - '{command}': {message}" for command, message in errors)
+            raise RuntimeError(f"Configuration rejected on {self.device.name}:\n{details}")
+        return output
+
+    def fetch_running_config(self) -> RunningConfig:
+        """
+        Read and parse the running configuration of the device (once per connection).
+
+        Returns:
+            RunningConfig: The parsed configuration, updated with every line pushed since.
+        """
+        if self.running_config is None:
+            self.execute('terminal length 0', prompt=device_prompt(self.device))
+            output = self.execute('show running-config', prompt=rf'\nend\s+{device_prompt(self.device)}',
+                                  timeout=SHOW_RUN_TIMEOUT)
+            self.running_config = RunningConfig.parse(output)
+        return self.running_config
+
+    def push_config(self, commands: ConfigCommands) -> None:
+        """
+        Send rendered configuration lines, either as one batch or one execute() per line.
+        In diff mode only the lines missing from the running configuration are sent.
+
+        Args:
+            commands (ConfigCommands): (command, prompt) pairs to send.
+        """
+        if self.diff and commands:
+            running = self.fetch_running_config()
+            commands = running.missing(commands)
+            if not commands:
+                logger.info("%s: configuration already applied, nothing to push", self.device.name)
+                return
+            running.record(commands)
+        if not commands:
+            return
+        self.changed = True
+        if self.batch:
+            self.send_config_batch(commands)
         else:
-            area = getattr(self.device.custom, 'ospf_area', 0)
-            self.execute(f'router ospf 1', prompt=r'\(config-router\)#')
+            for command, prompt in commands:
+                self.execute(command, prompt=prompt)
+
+    @staticmethod
+    def find_config_errors(output: str) -> List[Tuple[str, str]]:
+        """
+        Find the lines rejected by the device in the echoed output of a batch.
 
-            for iface in self.device.interfaces.values():
-                network = iface.ipv4.network.network_address
-                netmask = iface.ipv4.network.netmask
-                wildcard = ipaddress.IPv4Address((2 ** 32 - 1) - int(netmask))
+        Args:
+            output (str): Output returned while streaming the batch.
 
-                self.execute(f'network {network} {wildcard} area {area}', prompt=r'\(config-router\)#')
+        Returns:
+            List[Tuple[str, str]]: (command, error message) for every rejected line.
+        """
+        errors = []
+        last_command = ''
+        for line in output.splitlines():
+            line = line.strip()
+            echo = re.match(r'^[\w.\-]+(?:\([\w\-]+\))?#(.*)$', line)
+            if echo:
+                last_command = echo.group(1).strip()
+            elif line.startswith(CONFIG_ERROR_MARKERS):
+                errors.append((last_command, line))
+        return errors
 
-            self.execute('end', prompt=r'#')
+    def configure_routing(self) -> None:
+        """Configure static routes from custom.static_routes, or OSPF when none are defined."""
+        self.push_config(self.renderer.render(self.device, 'routing'))
 
     def configure_interfaces(self) -> None:
         """
@@ -212,39 +356,8 @@ class SSHConnectorParamiko:
         If ip_helper section is found in custom section from testbed, then it will be added
         according to the provided parameters.
         """
-        self.execute('configure terminal', prompt=r'\(config\)#')
-        for iface in self.device.interfaces.values():
-            if getattr(iface, 'alias', None) == 'initial':
-                continue
-            self.execute(f"interface {iface.name}", prompt=r'\(config-if\)#')
-            ip = iface.ipv4.ip.compressed
-            mask = iface.ipv4.network.netmask.exploded
-            self.execute(f"ip address {ip} {mask}", prompt=r'\(config-if\)#')
-            self.execute('no shutdown', prompt=r'\(config-if\)#')
-            self.execute('exit', prompt=r'\(config\)#')
-
-        # ip-helper condition
-        if 'ip_helper' in self.device.custom:
-            for iface_name, iface in self.device.interfaces.items():
-                # Check if the interface's alias matches the next_hop
-                if hasattr(iface, 'alias') and iface.alias == self.device.custom['ip_helper']['next_hop']:
-                    self.execute(f'interface {iface_name}', prompt=r'\(config-if\)#')
-                    self.execute(f'ip helper-address {self.device.custom["ip_helper"]["ip"]}',
-                                 prompt=r'\(config-if\)#')
-                    self.execute('exit', prompt=r'\(config\)#')
-
-        self.execute('end', prompt=r'#')
+        self.push_config(self.renderer.render(self.device, 'interfaces'))
 
     def configure_dhcp(self) -> None:
         # configure dhcp for csr device (or for any devices that specify dhcp in testbed)
-        if "dhcp" in self.device.custom:
-            self.execute("configure terminal", prompt=r'\(config\)#')
-            for pool in self.device.custom["dhcp"]:
-                self.execute(f"ip dhcp excluded-address {pool['excluded'][0]} {pool['excluded'][1]}",
-                             prompt=[r'\(config\)#'])
-                pool_name = f"POOL_{pool['network'].replace('.', '_')}"
-                self.execute(f"ip dhcp pool {pool_name}", prompt=[r'\(dhcp-config\)#'])
-                self.execute(f"network {pool['network']} {pool['mask']}", prompt=[r'\(dhcp-config\)#'])
-                self.execute(f"default-router {pool['default_router']}", prompt=[r'\(dhcp-config\)#'])
-                self.execute(f"dns-server {pool['dns_server']}", prompt=[r'\(dhcp-config\)#'])
-            self.execute("exit", prompt=r'#')
\ No newline at end of file
+        self.push_config(self.renderer.render(self.device, 'dhcp'))
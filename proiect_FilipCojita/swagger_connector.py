@@ -1,14 +1,110 @@
+import copy
 import json
+import os
+import tempfile
+import threading
+import time
 from typing import Optional
 
 import requests
+import requests.auth
 import urllib3
 from bravado.client import SwaggerClient
 from bravado.requests_client import RequestsClient
 from pyats.datastructures import AttrDict
 from pyats.topology import Device
 
+class FdmTokenManager:
+    """
+    Keeps the OAuth tokens of one FDM user, shared by every connector and thread.
+
+    The access token is refreshed with the refresh token shortly before it expires; a new
+    password grant is only made when there is no usable refresh token. A lock per manager
+    makes concurrent workers wait for one login instead of each starting their own.
+    """
+    TOKEN_ENDPOINT = '/api/fdm/latest/fdm/token'
+
+    _managers: dict[tuple[str, str], 'FdmTokenManager'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, url: str, username: str, password: str, refresh_margin: float = 60):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.refresh_margin = refresh_margin
+        self.token_type: Optional[str] = None
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_expires_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_device(cls, url: str, username: str, password: str) -> 'FdmTokenManager':
+        """Return the shared manager of this FDM url and user, creating it on first use."""
+        with cls._registry_lock:
+            manager = cls._managers.get((url, username))
+            if manager is None or manager.password != password:
+                manager = cls._managers[(url, username)] = cls(url, username, password)
+            return manager
+
+    def authorization(self) -> str:
+        """Value of the Authorization header, with a token valid for at least refresh_margin seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if self.access_token is None or now >= self._expires_at - self.refresh_margin:
+                if self.refresh_token is not None and now < self._refresh_expires_at - self.refresh_margin:
+                    try:
+                        self.__request_token({'grant_type': 'refresh_token', 'refresh_token': self.refresh_token})
+                    except requests.RequestException:
+                        self.__password_grant()
+                else:
+                    self.__password_grant()
+            return f'{self.token_type} {self.access_token}'
+
+    def __password_grant(self):
+        self.__request_token({'username': self.username, 'password': self.password, 'grant_type': 'password'})
+        print(f"Logged in to {self.url} as {self.username}")
+
+    def __request_token(self, payload: dict):
+        response = requests.post(
+            self.url + self.TOKEN_ENDPOINT,
+            verify=False,
+            data=json.dumps(payload),
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
+        )
+        response.raise_for_status()
+        token = response.json()
+        now = time.monotonic()
+        self.access_token = token['access_token']
+        self.token_type = token['token_type']
+        self.refresh_token = token.get('refresh_token')
+        # FDM defaults: 30 minutes for the access token, 40 for the refresh token
+        self._expires_at = now + token.get('expires_in', 1800)
+        self._refresh_expires_at = now + token.get('refresh_expires_in', 2400)
+
+
+class FdmTokenAuth(requests.auth.AuthBase):
+    """requests auth hook setting a fresh FDM bearer token on every request."""
+
+    def __init__(self, manager: FdmTokenManager):
+        self.manager = manager
+
+    def __call__(self, request):
+        request.headers['Authorization'] = self.manager.authorization()
+        return request
+
+
 class SwaggerConnector:
+    SPEC_ENDPOINT = '/apispec/ngfw.json'
+    VERSION_ENDPOINT = '/api/fdm/latest/operational/systeminfo/default'
+    SPEC_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'fdm_apispec')
+
+    # parsed ngfw specs keyed by FDM version, and built clients keyed by (version, url),
+    # shared by every connector of the process
+    _specs: dict[str, dict] = {}
+    _clients: dict[tuple[str, str], SwaggerClient] = {}
+    _cache_lock = threading.Lock()
 
     def __init__(self, device: Device, **kwargs):
         self._session = None
@@ -20,41 +116,90 @@ class SwaggerConnector:
         self.connection: Optional[AttrDict] = None
         self.api_endpoints: list[str] = None
         self.client: Optional[SwaggerClient] = None
+        self.spec_cache_dir: Optional[str] = kwargs.get('spec_cache_dir', self.SPEC_CACHE_DIR)
+        self.fdm_version: Optional[str] = None
+        self.tokens: Optional[FdmTokenManager] = None
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
     def connect(self, **kwargs):
         self.connection = kwargs['connection']
-        endpoint = '/apispec/ngfw.json'
         self._url = f'https://{self.connection.ip.compressed}:{self.connection.port}'
         self.__login(
             self.connection.credentials.login.username,
             self.connection.credentials.login.password.plaintext
         )
-        self._headers.update({'Authorization': f'{self.token_type} {self.access_token}'})
+        self._auth = FdmTokenAuth(self.tokens)
+        self.fdm_version = self.__get_fdm_version()
+
+        # a reconnect to the same FDM reuses the built client
+        cached = self._clients.get((self.fdm_version, self._url)) if self.fdm_version else None
+        if cached is not None:
+            cached.swagger_spec.http_client.session.auth = self._auth
+            self.client = cached
+            return
+
         https_client = RequestsClient()
         https_client.session.verify = False
         https_client.ssl_verify = False
         https_client.session.headers = self._headers
-        swagger_client = SwaggerClient.from_url(
-            self._url + endpoint,
+        # the token is set per request, so long workflows survive its expiry
+        https_client.session.auth = self._auth
+        swagger_client = SwaggerClient.from_spec(
+            copy.deepcopy(self.__load_spec()),
+            origin_url=self._url + self.SPEC_ENDPOINT,
             http_client=https_client,
-            request_headers=self._headers,
             config={'validate_certificate': False, 'validate_responses': False},
         )
+        if self.fdm_version:
+            with self._cache_lock:
+                self._clients[(self.fdm_version, self._url)] = swagger_client
         self.client = swagger_client
 
     def __login(self, username: Optional[str] = None, password: Optional[str] = None):
-        endpoint = '/api/fdm/latest/fdm/token'
-        response = requests.post(
-            self._url + endpoint,
-            verify=False,
-            data=json.dumps({'username': username, 'password': password, 'grant_type': 'password'}),
-            headers=self._headers
-        )
-        print("Login response:", response.text)
-        self.access_token = response.json()['access_token']
-        self.token_type = response.json()['token_type']
-        self.refresh_token = response.json()['refresh_token']
+        self.tokens = FdmTokenManager.for_device(self._url, username, password)
+        self.tokens.authorization()
+        self.access_token = self.tokens.access_token
+        self.token_type = self.tokens.token_type
+        self.refresh_token = self.tokens.refresh_token
+
+    def __get_fdm_version(self) -> Optional[str]:
+        """Software version of the FDM, used as cache key for its API spec (None if unknown)."""
+        try:
+            response = requests.get(self._url + self.VERSION_ENDPOINT, verify=False, headers=self._headers, auth=self._auth)
+            response.raise_for_status()
+            return response.json().get('softwareVersion')
+        except (requests.RequestException, ValueError):
+            return None
+
+    def __load_spec(self) -> dict:
+        """
+        Return the ngfw spec of this FDM version: from memory, then from disk, and only
+        downloaded when neither has it.
+        """
+        version = self.fdm_version
+        if version in self._specs:
+            return self._specs[version]
+
+        path = os.path.join(self.spec_cache_dir, f'ngfw-{version}.json') if version and self.spec_cache_dir else None
+        if path and os.path.exists(path):
+            with open(path) as file:
+                spec = json.load(file)
+        else:
+            response = requests.get(self._url + self.SPEC_ENDPOINT, verify=False, headers=self._headers, auth=self._auth)
+            response.raise_for_status()
+            spec = response.json()
+            if path:
+                os.makedirs(self.spec_cache_dir, exist_ok=True)
+                # write to a temporary file first, so concurrent runs never read a partial spec
+                fd, tmp_path = tempfile.mkstemp(dir=self.spec_cache_dir, suffix='.tmp')
+                with os.fdopen(fd, 'w') as file:
+                    json.dump(spec, file)
+                os.replace(tmp_path, path)
+
+        if version:
+            with self._cache_lock:
+                self._specs[version] = spec
+        return spec
 
 
     def disconnect(self):
@@ -4,11 +4,12 @@ depending on which device connects via telnet.
 """
 import logging
 import telnetlib
-from time import sleep
-from typing import Optional, Any, List
+from typing import Optional, Any, Tuple
 from pyats.datastructures import AttrDict
 from pyats.topology import Device
-from unicon.plugins.asa.statements import enable_password
+
+from config_renderer import ConfigRenderer, CRYPTO_KEY_COMMAND, CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE
+from prompt_registry import prompt_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -26,14 +27,30 @@ class TelnetConnector2:
     """
     Telnet connector class to manage telnet connections and device configuration.
     """
+    # upper bounds (seconds) for the slow bootstrap steps; waits end as soon as the prompt shows up
+    DEFAULT_TIMEOUT: int = 10
+    AUTOINSTALL_TIMEOUT: int = 60
+    CRYPTO_KEY_TIMEOUT: int = 120
+    EULA_TIMEOUT: int = 60
 
     def __init__(self, device: Device, **kwargs) -> None:
         """
         Initialize with a pyATS Device object.
+
+        Args:
+            device (Device): pyATS device object to connect to.
+            **kwargs: Optional timeouts overriding the class defaults (timeout,
+                autoinstall_timeout, crypto_key_timeout, eula_timeout), and the
+                ConfigRenderer rendering the bootstrap commands (renderer).
         """
         self._conn: Optional[telnetlib.Telnet] = None
         self.device: Device = device
         self.connection: Optional[AttrDict] = None
+        self.timeout: int = kwargs.get('timeout', self.DEFAULT_TIMEOUT)
+        self.autoinstall_timeout: int = kwargs.get('autoinstall_timeout', self.AUTOINSTALL_TIMEOUT)
+        self.crypto_key_timeout: int = kwargs.get('crypto_key_timeout', self.CRYPTO_KEY_TIMEOUT)
+        self.eula_timeout: int = kwargs.get('eula_timeout', self.EULA_TIMEOUT)
+        self.renderer: ConfigRenderer = kwargs.get('renderer') or ConfigRenderer()
 
     def connect(self, **kwargs: Any) -> None:
         """
@@ -78,32 +95,53 @@ class TelnetConnector2:
 
     def try_skip_initial_config_dialog(self, last_out: str):
         """
-        Checks if autoconfiguration is in progress and cancels if so
+        Checks if autoconfiguration is in progress and cancels if so.
+        The console is woken up and the answer is chosen from the prompt it shows.
             Args:
                 last_out(str): The last output on the console
         """
-        self.write('')
-        if 'initial configuration dialog?' or '\'yes\' or \'no\'' in last_out:
+        index, output = self.expect_any('', prompt=[r'initial configuration dialog\?', r'\[yes/no\]:',
+                                                    r'[\w.\-]+>', r'[\w.\-]+#'])
+        if index in (0, 1) or 'initial configuration dialog?' in last_out:
             self.execute('no', prompt=[r'terminate autoinstall\? \[yes\]:'])
-            self.write('yes')
-            sleep(20)
-            self.write('\r')
-            self.execute('', prompt=[r'\w+\>'])
+            # autoinstall is stopped once the console asks for RETURN
+            self.execute('yes', prompt=[r'Press RETURN to get started'], timeout=self.autoinstall_timeout)
+            self.execute('\r', prompt=[r'\w+\>'])
 
-    def execute(self, command: str, **kwargs: Any) -> str:
+    def expect_any(self, command: Optional[str], **kwargs: Any) -> Tuple[int, str]:
         """
-        Execute a command over telnet and wait for prompt(s).
+        Send a command (None sends nothing) and wait for any of the given prompts.
+
+        Args:
+            command (Optional[str]): Command to send before waiting.
+            **kwargs: prompt (list of regex strings) and timeout (seconds).
+
+        Returns:
+            Tuple[int, str]: Index of the matched prompt (-1 on timeout) and the output read.
         """
         if not self._conn:
             raise RuntimeError("Connection not established. Call connect() first.")
-        prompt: List[bytes] = list(map(lambda _: _.encode(), kwargs.get('prompt', [])))
-        self._conn.write(f'{command}\n'.encode())
-        logger.info(command)
+        matcher = prompt_matcher(kwargs.get('prompt', []))
+        if command is not None:
+            self._conn.write(f'{command}\n'.encode())
+            logger.info(command)
         try:
-            index, match, output = self._conn.expect(prompt, timeout=10)
-            return output.decode(errors="ignore")
+            # one combined regex: telnetlib scans the output once per chunk instead of once per prompt
+            index, match, output = self._conn.expect([matcher.regex], timeout=kwargs.get('timeout', self.timeout))
+            if match is not None:
+                index = matcher.index(match)
+            return index, output.decode(errors="ignore")
         except EOFError:
             raise RuntimeError("Connection closed unexpectedly during command execution.")
+
+    def execute(self, command: str, **kwargs: Any) -> str:
+        """
+        Execute a command over telnet and wait for prompt(s).
+        """
+        try:
+            return self.expect_any(command, **kwargs)[1]
+        except RuntimeError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error executing command '{command}': {e}")
 
@@ -137,6 +175,7 @@ class TelnetConnector2:
         - Optionally configuring an 'enable secret' password (only if platform is 'iosv').
 
         Finally, the configuration is saved to NVRAM and the CLI is returned to exec mode.
+        The commands are rendered by config_renderer.bootstrap_commands.
 
         Notes:
             - This method assumes the `device` object is a valid pyATS Device with
@@ -152,86 +191,35 @@ class TelnetConnector2:
         out = self.read()
         self.try_skip_initial_config_dialog(out)
 
-        self.execute("\n", prompt=r'>')
-        self.execute("en", prompt=r'#')
-        self.execute('conf t', prompt=[r'\(config.*\)#'])
-
-        # configure initial interface
-        interface = self.device.interfaces['initial']
-        self.execute(f"int {interface.name}", prompt=[r'\(config-if\)#'])
-        ip = interface.ipv4.ip.compressed
-        mask = interface.ipv4.network.netmask.exploded
-        self.execute(f"ip add {ip} {mask}", prompt=[r'\(config-if\)#'])
-        self.execute('no shut', prompt=[r'\(config-if\)#'])
-        self.execute('exit', prompt=[r'\(config\)#'])
-
-        # configure initial route
-        if 'gateway' in self.device.custom:
-            self.execute(
-                f'ip route {self.device.custom.gateway["dest"]} {mask} {self.device.custom.gateway["next_hop"]}',
-                prompt=[r'\(config\)#'])
-
-        #configure ssh on device
-        hostname = self.device.custom.hostname
-        self.execute(f'hostname {hostname}', prompt=[r'\(config\)#'])
-        self.execute('ip domain name localdomain', prompt=[r'\(config\)#'])
-        out = self.execute('crypto key generate rsa modulus 2048',
-                           prompt=[r'\(config\)#', r'replace them\?'])
-        sleep(5)
-        if 'replace them' in out:
-            self.execute('yes', prompt=[r'\(config\)#'])
-            sleep(5)
-        username = self.device.credentials.default.username
-        password = self.device.credentials.default.password.plaintext
-        enable_password = self.device.credentials.enable.password.plaintext
-        self.execute(f'username {username} privilege 15 secret {password}',
-                     prompt=[r'\(config\)#'])
-        self.execute('line vty 0 4', prompt=[r'\(config-line\)#'])
-        self.execute("transport input ssh", prompt=[r'\(config-line\)#'])
-        self.execute("login local", prompt=[r'\(config-line\)#'])
-        self.execute('exit', prompt=[r'\(config\)#'])
-        self.execute('ip ssh version 2', prompt=[r'\(config\)#'])
-        self.execute('ip scp server enable', prompt=[r'\(config\)#'])
-        self.execute(f'enable secret {enable_password}', prompt=[r'\(config\)#'])
-        self.execute('end', prompt=[rf'{hostname}#'])
-        self.execute('write memory', prompt=[rf'\[OK\]|{hostname}#'])
-        self.execute('', prompt=[rf'{hostname}#'])
+        for command, prompt in self.renderer.render(self.device, 'bootstrap'):
+            if command == CRYPTO_KEY_COMMAND:
+                # key generation may first ask to replace the existing keys
+                index, _ = self.expect_any(command, prompt=[CRYPTO_KEY_DONE, CRYPTO_KEY_REPLACE],
+                                           timeout=self.crypto_key_timeout)
+                if index == 1:
+                    index, _ = self.expect_any('yes', prompt=[CRYPTO_KEY_DONE], timeout=self.crypto_key_timeout)
+                if index == -1:
+                    raise RuntimeError("Timeout generating the RSA keys on the console.")
+                continue
+            self.execute(command, prompt=[prompt])
 
     def _initial_conf_ftd(self) -> None:
         """
         Initial configuration for Firepower Threat Defense (FTD) devices.
         """
-        hostname = self.device.custom.hostname
-        dns = self.device.custom.dns
+        for command, prompt in self.renderer.render(self.device, 'login'):
+            self.execute(command, prompt=[prompt])
 
-        self.execute('', prompt=['firepower login:'])
-        self.execute('admin', prompt=['Password:'])
-        self.execute('Admin123', prompt=['Press <ENTER> to display the EULA:'])
-
-        self.execute('\n', prompt=['--MORE--'])
-        for i in range(15):
+        # page through the EULA: one space key per --MORE-- prompt
+        index, _ = self.expect_any('\n', prompt=['--MORE--', 'AGREE to the EULA:'], timeout=self.eula_timeout)
+        while index == 0:
             self._conn.write(b' ')  # write space key
-            sleep(0.5)
-
-        self._conn.expect([b'AGREE to the EULA:'])
-        self.execute('', prompt=['Enter new password:'])
-        self.execute(f'{self.device.connections.ssh.credentials.login.password.plaintext}',
-                     prompt=['Confirm new password:'])
-        self.execute(f'{self.device.connections.ssh.credentials.login.password.plaintext}',
-                     prompt=['Do you want to configure IPv4\\? \\(y/n\\) \\[y\\]:'])
-        self.execute('y', prompt=['Do you want to configure IPv6\\? \\(y/n\\) \\[n\\]:'])
-        self.execute('n', prompt=['Configure IPv4 via DHCP or manually\\? \\(dhcp/manual\\) \\[manual\\]:'])
-        self.execute('manual', prompt=['Enter an IPv4 address for the management interface \\[192\\.168\\.45\\.45\\]:'])
-        self.execute(self.device.interfaces['mgmt'].ipv4.ip.compressed,
-                     prompt=['Enter an IPv4 netmask for the management interface \\[255\\.255\\.255\\.0\\]'])
-        self.execute(self.device.interfaces['mgmt'].ipv4.netmask.compressed,
-                     prompt=['Enter the IPv4 default gateway for the management interface \\[192\\.168\\.45\\.1\\]:'])
-        self.execute(f'{self.__find_gateway_ftd()}',
-                     prompt=['Enter a fully qualified hostname for this system \\[firepower\\]:'])
-        self.execute(f'{hostname}', prompt=['Enter a comma-separated list of DNS severs or \'none\' \\[200\\.67\\.222\\.222\\,208\\.67\\.220\\.220\\]'])
-        self.execute(f'{dns}', prompt=['Enter a comma-separated list of search domains or \'none\' \\[\\]'])
-        self.execute('none', prompt=['Manage the device locally\\? \\(yes/no\\) \\[yes\\]:'])
-        self.execute('yes', prompt=['>'])
+            index, _ = self.expect_any(None, prompt=['--MORE--', 'AGREE to the EULA:'], timeout=self.eula_timeout)
+        if index == -1:
+            raise RuntimeError("Timeout paging the EULA on the FTD console.")
+
+        for command, prompt in self.renderer.render(self.device, 'setup'):
+            self.execute(command, prompt=[prompt])
 
     def enable_rest(self) -> None:
         """
@@ -246,17 +234,3 @@ class TelnetConnector2:
         Placeholder for network driver retrieval (not implemented).
         """
         raise NotImplementedError("get_network_driver is not implemented yet.")
-
-    def __find_gateway_ftd(self):
-        """
-        Find the gateway IP for FTD device from custom attributes.
-        """
-        link_obj = self.device.interfaces['mgmt'].link
-        for dev in link_obj.connected_devices:
-            if dev == self.device:
-                continue
-            for interface in dev.interfaces.values():
-                int_found = interface if interface.link == link_obj else None
-                if int_found:
-                    return int_found.ipv4.ip.compressed
-        return None
@@ -0,0 +1,47 @@
+"""
+testbed_cache keeps the pyATS testbeds parsed by this process, so every script and
+helper that needs the topology shares one parse of the YAML file.
+"""
+import os
+import threading
+from typing import Dict, Tuple, Union
+from pyats.topology import Testbed, loader
+
+# (absolute path, modification time) -> parsed testbed
+_testbeds: Dict[Tuple[str, int], Testbed] = {}
+_lock = threading.Lock()
+
+
+def load_testbed(testbed: Union[str, Testbed]) -> Testbed:
+    """
+    Return a loaded testbed, parsing the file only the first time it is seen.
+
+    A file modified since it was parsed is parsed again. The same Testbed object is
+    returned to every caller, so changes made to it (e.g. by autofill_missing_data)
+    are seen by all of them.
+
+    Args:
+        testbed (Union[str, Testbed]): Path to a testbed YAML file, or an already loaded testbed
+            (returned unchanged).
+
+    Returns:
+        Testbed: The parsed testbed.
+    """
+    if isinstance(testbed, Testbed):
+        return testbed
+
+    path = os.path.abspath(testbed)
+    key = (path, os.stat(path).st_mtime_ns)
+    with _lock:
+        if key not in _testbeds:
+            # forget the versions of this file parsed before it was modified
+            for stale in [k for k in _testbeds if k[0] == path]:
+                del _testbeds[stale]
+            _testbeds[key] = loader.load(path)
+        return _testbeds[key]
+
+
+def clear_testbed_cache() -> None:
+    """Forget every parsed testbed."""
+    with _lock:
+        _testbeds.clear()
@@ -1,8 +1,12 @@
+import json
 import logging
 import subprocess
-from pyats.topology import Device, loader
+from typing import List, Set, Union
+from pyats.topology import Device, Testbed
 from ipaddress import IPv4Network
 
+from testbed_cache import load_testbed
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, encoding='utf-8')
 
@@ -19,18 +23,21 @@ class UbuntuNetworkConfigurator:
         ip (str): IP address to assign to the interface.
         gateway (str): Default gateway IP address.
         routes (dict): A dictionary of static routes to be added.
+        batch (bool): Read the routing table once and add all missing routes with one 'ip -batch' call.
     """
 
-    def __init__(self, device: Device, testbed_path: str = None):
+    def __init__(self, device: Device, testbed_path: Union[str, Testbed] = None, batch: bool = False):
         """
         Initializes the configurator using custom attributes defined under the device.
         If routes are not provided, attempts to generate them from the testbed topology.
 
         Args:
             device (Device): pyATS device representing the Ubuntu system.
-            testbed_path (str, optional): Path to the testbed file for route discovery.
+            testbed_path (str | Testbed, optional): Testbed, or path to the testbed file, for route discovery.
+            batch (bool, optional): Program the routes in batch mode (see add_routes_batch).
         """
         self.device = device
+        self.batch = batch
         self.name = device.name
         custom = device.custom.get('network_config', {})
 
@@ -74,35 +81,87 @@ class UbuntuNetworkConfigurator:
                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
         return destination in result.stdout
 
+    def existing_routes(self) -> Set[str]:
+        """
+        Reads the whole IPv4 routing table with a single 'ip -j route show' call.
+
+        Returns:
+            set: Destinations of the installed routes (e.g. {'default', '192.168.111.0/24'}).
+        """
+        result = subprocess.run(['ip', '-j', 'route', 'show'],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to read the routing table: {result.stderr.strip()}")
+
+        routes = set()
+        for route in json.loads(result.stdout or '[]'):
+            dst = route.get('dst')
+            routes.add(dst if dst == 'default' else str(IPv4Network(dst, strict=False)))
+        return routes
+
+    def missing_routes(self) -> List[str]:
+        """
+        Returns the configured route destinations that are not installed yet, in configuration order.
+        """
+        existing = self.existing_routes()
+        missing = []
+        for subnet in self.routes.values():
+            normalized = str(IPv4Network(subnet, strict=False))
+            if normalized not in existing and subnet not in missing:
+                missing.append(subnet)
+        return missing
+
+    def add_routes_batch(self, subnets: List[str]):
+        """
+        Adds routes via the gateway with one 'sudo ip -batch' call instead of one 'ip route add' per route.
+        With -force, a rejected line is logged and the remaining routes are still added.
+
+        Args:
+            subnets (list): Destination subnets to add.
+        """
+        commands = ''.join(f"route add {subnet} via {self.gateway}\n" for subnet in subnets)
+        result = subprocess.run(['sudo', 'ip', '-force', '-batch', '-'], input=commands,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            logger.error(f"Error: {result.stderr.strip()}")
+        else:
+            logger.debug(f"Output: {result.stdout.strip()}")
+
     def configure(self):
         """
         Configures the Ubuntu network interface and adds static routes.
         - Assigns IP to the interface.
         - Brings the interface up.
-        - Adds routes if they don't already exist.
+        - Adds routes if they don't already exist (all at once in batch mode).
         """
         self.run_command(['sudo', 'ip', 'address', 'add', self.ip, 'dev', self.interface])
         self.run_command(['sudo', 'ip', 'link', 'set', self.interface, 'up'])
 
-        for label, subnet in self.routes.items():
-            if not self.route_exists(subnet):
-                self.run_command(['sudo', 'ip', 'route', 'add', subnet, 'via', self.gateway])
+        if self.batch:
+            missing = self.missing_routes()
+            if missing:
+                self.add_routes_batch(missing)
+        else:
+            for label, subnet in self.routes.items():
+                if not self.route_exists(subnet):
+                    self.run_command(['sudo', 'ip', 'route', 'add', subnet, 'via', self.gateway])
 
         logger.info(f"Finished configuration for Ubuntu device: {self.name}")
 
     @staticmethod
-    def generate_routes_from_testbed(testbed_path: str, ubuntu_device_name: str) -> dict:
+    def generate_routes_from_testbed(testbed_path: Union[str, Testbed], ubuntu_device_name: str) -> dict:
         """
         Generates a dictionary of unique /24 routes based on the IPs of other devices in the topology.
 
         Args:
-            testbed_path (str): Path to the testbed YAML file.
+            testbed_path (str | Testbed): The loaded testbed, or the path to its YAML file
+                (parsed through the shared testbed cache).
             ubuntu_device_name (str): Name of the Ubuntu device to exclude from route generation.
 
         Returns:
             dict: A dictionary of routes in the format {'route-1': '192.168.x.x/24', ...}
         """
-        tb = loader.load(testbed_path)
+        tb = load_testbed(testbed_path)
         route_set = set()
 
         for device_name, device in tb.devices.items():
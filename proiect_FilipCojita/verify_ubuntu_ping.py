@@ -3,16 +3,37 @@
 import subprocess
 import sys
 import json
-from typing import List, Tuple, Dict
-from pyats.topology import loader
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple, Dict, Union
+from pyats.topology import Testbed
+
+from icmp_prober import IcmpProber
+from testbed_cache import load_testbed
 
 
 class UbuntuPingTester:
     """Class to ping multiple IP endpoints and verify connectivity."""
 
-    def __init__(self, endpoints: List[str]) -> None:
+    BACKENDS = ('subprocess', 'icmp')
+
+    def __init__(self, endpoints: List[str], max_workers: int = 1, backend: str = 'subprocess', **kwargs) -> None:
+        """
+        Args:
+            endpoints (List[str]): IP addresses to ping.
+            max_workers (int): Number of pings run at the same time (1 pings one after another).
+            backend (str): 'subprocess' runs the ping command per endpoint, 'icmp' probes every
+                endpoint over one ICMP socket (see IcmpProber) and also records rtt and loss.
+            **kwargs: Forwarded to IcmpProber (count, timeout, interval, payload_size).
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {self.BACKENDS}.")
         self.endpoints = endpoints
-        self.results: Dict[str, Dict[str, str]] = {}
+        self.max_workers = max_workers
+        self.backend = backend
+        self.prober_options: Dict[str, Any] = kwargs
+        self.results: Dict[str, Dict[str, Any]] = {}
 
     def ping(self, ip: str) -> Tuple[str, bool]:
         """Ping a single IP address and store result in the results' dictionary."""
@@ -39,15 +60,51 @@ class UbuntuPingTester:
 
         return ip, success
 
+    def probe_all(self) -> List[Tuple[str, bool]]:
+        """Probe every endpoint over one ICMP socket and store rtt and loss in the results' dictionary."""
+        stats = IcmpProber(**self.prober_options).probe(self.endpoints)
+        outcomes = []
+        for ip in self.endpoints:
+            entry = stats[ip]
+            success = entry['received'] > 0
+            summary = (f"{entry['sent']} packets transmitted, {entry['received']} received, "
+                       f"{entry['loss']:.0%} packet loss")
+            if success:
+                summary += f"\nrtt min/avg/max = {entry['rtt_min']}/{entry['rtt_avg']}/{entry['rtt_max']} ms"
+            self.results[ip] = {
+                "status": "reachable" if success else "unreachable",
+                "stdout": summary,
+                "stderr": "",
+                **entry,
+            }
+            print(f"\n{ip}: {summary}")
+            outcomes.append((ip, success))
+        return outcomes
+
     def verify_all(self) -> bool:
+        """
+        Ping every endpoint, up to max_workers at a time, and print a summary.
+
+        Returns:
+            bool: True if every endpoint answered.
+        """
+        if self.backend == 'icmp':
+            outcomes = self.probe_all()
+        elif self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ping') as pool:
+                outcomes = list(pool.map(self.ping, self.endpoints))
+            # keep the results in endpoint order, as a sequential run would
+            self.results = {ip: self.results[ip] for ip in self.endpoints if ip in self.results}
+        else:
+            outcomes = [self.ping(ip_addr) for ip_addr in self.endpoints]
+
         failed = []
         succeeded = []
-        for ip_addr in self.endpoints:
-            ip, success = self.ping(ip_addr)
+        for ip, success in outcomes:
             if not success:
                 failed.append(ip)
             else:
-                succeeded.append(ip_addr)
+                succeeded.append(ip)
 
         if not failed:
             print("\nAll endpoints are reachable!")
@@ -70,8 +127,8 @@ class UbuntuPingTester:
             print(f"\n[ERROR] Failed to write JSON file: {e}")
 
 
-def extract_ips_from_testbed(testbed_path: str) -> List[str]:
-    tb = loader.load(testbed_path)
+def extract_ips_from_testbed(testbed_path: Union[str, Testbed]) -> List[str]:
+    tb = load_testbed(testbed_path)
     ips = []
 
     for device in tb.devices.values():
@@ -90,12 +147,16 @@ def extract_ips_from_testbed(testbed_path: str) -> List[str]:
     return ips
 
 
+# Number of endpoints pinged at the same time
+MAX_WORKERS = 32
+
+
 def main():
     testbed_file = 'mytopo.yaml'
     endpoints = extract_ips_from_testbed(testbed_file)
     print("Collected endpoints to ping:", endpoints)
 
-    tester = UbuntuPingTester(endpoints)
+    tester = UbuntuPingTester(endpoints, max_workers=MAX_WORKERS)
     success = tester.verify_all()
     tester.write_results_to_json("ping_results.json")
 